@@ -1,26 +1,14 @@
-import sqlite3
+from db_utils import close_db, format_customer_id, is_legacy_customers_table, open_db
 
 # Connect to the customer database
-conn = sqlite3.connect('data/customer_database.db')
+conn = open_db('data/customer_database.db')
 cursor = conn.cursor()
 
-# Function to add a real customer
-def add_real_customer(customer_name, mobile_number, email, mobile_type):
-    # Generate a new customer_id based on current max ID
-    cursor.execute("SELECT MAX(SUBSTR(customer_id, 5)) FROM customers")
-    max_id = cursor.fetchone()[0]
-    if max_id is None:
-        max_id = 0
-    new_id = int(max_id) + 1
-    customer_id = f"CUST{new_id:06d}"
-    
-    # Insert the new customer
-    cursor.execute(
-        "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-        (customer_id, customer_name, mobile_number, email, mobile_type)
-    )
-    conn.commit()
-    return customer_id
+# Tables from before the integer id key have no id column to allocate from
+if is_legacy_customers_table(conn):
+    print("Customer database uses an outdated structure; recreate it with generate_customer_db.py first.")
+    close_db(conn)
+    exit()
 
 # Sample real customers to add
 real_customers = [
@@ -29,15 +17,24 @@ real_customers = [
     ("Robert Davis", "+13125552345", "robert.davis@example.com", "iOS")
 ]
 
-# Add each real customer
-for customer in real_customers:
-    try:
-        customer_id = add_real_customer(*customer)
-        print(f"Added real customer: {customer[0]} with ID: {customer_id}")
-    except Exception as e:
-        print(f"Error adding customer {customer[0]}: {e}")
+# Add all real customers in one transaction: look up the current max key
+# once (an index lookup on the INTEGER PRIMARY KEY) and insert in one batch
+try:
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM customers")
+    base_id = cursor.fetchone()[0]
+    rows = [(base_id + i, *customer) for i, customer in enumerate(real_customers, 1)]
+    cursor.executemany(
+        "INSERT INTO customers (id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+    for row in rows:
+        print(f"Added real customer: {row[1]} with ID: {format_customer_id(row[0])}")
+    print("Real customers added successfully!")
+except Exception as e:
+    conn.rollback()
+    print(f"Error adding real customers: {e}")
 
 # Close the connection
-conn.close()
-
-print("Real customers added successfully!")
+close_db(conn)
@@ -1,20 +1,120 @@
 import streamlit as st
 import sqlite3
+import hashlib
+import hmac
 import os
 import pandas as pd
-import random
-import string
+import numpy as np
 from datetime import datetime
+from itertools import chain
+from db_utils import CUSTOMERS_TABLE_SQL, WRITE_LOCK, begin_bulk_load, close_db, db_mtime, end_bulk_load, open_db, remove_db
+from streamlit_utils import fragment
+
+# SHA-256 of the admin password (simple password, change in production)
+ADMIN_PASSWORD_SHA256 = bytes.fromhex("240be518fabd2724ddb6f04eeb1da5967448d7e831c08c8fa822809f74c720a9")
+
+# Diagnostics queries; kept as fixed text so the cached connection's statement
+# cache reuses the compiled statements across reruns
+CUSTOMERS_EXISTS_SQL = "SELECT name FROM sqlite_master WHERE type='table' AND name='customers'"
+CUSTOMERS_COUNT_SQL = "SELECT COUNT(*) FROM customers"
+CUSTOMERS_DIST_SQL = "SELECT mobile_type, COUNT(*) FROM customers GROUP BY mobile_type"
+CUSTOMERS_SAMPLE_SQL = "SELECT * FROM customers LIMIT 5"
+OFFERS_EXISTS_SQL = "SELECT name FROM sqlite_master WHERE type='table' AND name='offers'"
+OFFERS_COUNT_SQL = "SELECT COUNT(*) FROM offers"
+
+# Connections handed out by get_read_conn, so they can be closed before their file is removed
+READ_CONNS = {}
+
+@st.cache_resource
+def get_read_conn(db_path):
+    """Get a long-lived read-only connection to a database, shared across reruns"""
+    conn = open_db(db_path, check_same_thread=False)
+    conn.execute("PRAGMA query_only=ON")
+    READ_CONNS[db_path] = conn
+    return conn
+
+@st.cache_data(ttl=60)
+def list_tables(db_path):
+    """List the tables in a database"""
+    cursor = get_read_conn(db_path).execute("SELECT name FROM sqlite_master WHERE type='table'")
+    return [table[0] for table in cursor.fetchall()]
+
+def check_table(db_path, table):
+    """Only allow names of existing tables to be interpolated into SQL"""
+    if table not in list_tables(db_path):
+        raise ValueError(f"Unknown table: {table}")
+    return table
+
+@st.cache_data(ttl=60)
+def get_schema(db_path, table):
+    """Get the column definitions of a table"""
+    cursor = get_read_conn(db_path).execute(f"PRAGMA table_info({check_table(db_path, table)})")
+    return pd.DataFrame(cursor.fetchall(), columns=["cid", "name", "type", "notnull", "dflt_value", "pk"])
+
+@st.cache_data(ttl=60)
+def count_rows(db_path, table):
+    """Count the rows in a table"""
+    return get_read_conn(db_path).execute(f"SELECT COUNT(*) FROM {check_table(db_path, table)}").fetchone()[0]
+
+@st.cache_data(ttl=60)
+def fetch_head(db_path, table, hard_limit=100):
+    """Fetch the first rows of a table once; the explorer slices them locally"""
+    query = f"SELECT * FROM {check_table(db_path, table)} LIMIT ?"
+    return pd.read_sql_query(query, get_read_conn(db_path), params=(hard_limit,))
+
+@st.cache_data(ttl=60)
+def get_distribution(db_path, table, column):
+    """Count the rows of a table per value of a column"""
+    if column not in get_schema(db_path, table)["name"].tolist():
+        raise ValueError(f"Unknown column: {table}.{column}")
+    cursor = get_read_conn(db_path).execute(f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column}")
+    return cursor.fetchall()
+
+def get_customer_db_summary(db_path):
+    """Query the customers table, reusing the session's result until the database changes"""
+    key = (db_path, db_mtime(db_path))
+    cached = st.session_state.get("customer_db_summary")
+    if cached and cached[0] == key:
+        return cached[1]
+    
+    cursor = get_read_conn(db_path).cursor()
+    summary = {"table_exists": False, "count": 0, "distribution": [], "sample": []}
+    if cursor.execute(CUSTOMERS_EXISTS_SQL).fetchone():
+        summary["table_exists"] = True
+        summary["count"] = cursor.execute(CUSTOMERS_COUNT_SQL).fetchone()[0]
+        if summary["count"]:
+            summary["distribution"] = cursor.execute(CUSTOMERS_DIST_SQL).fetchall()
+            cursor.execute(CUSTOMERS_SAMPLE_SQL)
+            columns = [desc[0] for desc in cursor.description]
+            summary["sample"] = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    st.session_state["customer_db_summary"] = (key, summary)
+    return summary
+
+def clear_db_caches():
+    """Drop cached connections and metadata after a database is rebuilt or removed"""
+    # Clearing the cache does not close the connections, so release the file handles first
+    while READ_CONNS:
+        READ_CONNS.popitem()[1].close()
+    get_read_conn.clear()
+    list_tables.clear()
+    get_schema.clear()
+    count_rows.clear()
+    fetch_head.clear()
+    get_distribution.clear()
 
 def admin_panel():
     """Admin panel for database management"""
     st.title("Database Administration")
     
-    # Password protection (simple)
-    password = st.text_input("Enter admin password", type="password")
-    if password != "admin123":  # Simple password, change in production
-        st.warning("Enter the admin password to continue")
-        return
+    # Password protection (simple); checked once per session
+    if not st.session_state.get("admin_ok"):
+        password = st.text_input("Enter admin password", type="password")
+        password_hash = hashlib.sha256(password.encode()).digest()
+        if not hmac.compare_digest(password_hash, ADMIN_PASSWORD_SHA256):
+            st.warning("Enter the admin password to continue")
+            return
+        st.session_state["admin_ok"] = True
     
     st.success("Admin access granted")
     
@@ -51,10 +151,11 @@ def admin_panel():
         db_type = st.selectbox("Select Database", ["Customers", "Offers"])
         
         if db_type == "Customers":
-            explore_customer_database()
+            explore_db('data/customer_database.db', 'mobile_type', label="Customer")
         else:
-            explore_offers_database()
+            explore_db('data/offers_database.db', 'type', label="Offers")
 
+@fragment
 def run_database_diagnostics():
     """Run diagnostics on all databases"""
     st.subheader("Customer Database")
@@ -81,48 +182,28 @@ def run_database_diagnostics():
         st.info(f"File size: {file_size_kb:.2f} KB")
         
         try:
-            # Connect to the database
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            summary = get_customer_db_summary(db_path)
             
-            # Check if customers table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='customers'")
-            table_exists = cursor.fetchone()
-            
-            if not table_exists:
+            if not summary["table_exists"]:
                 st.error("❌ 'customers' table does not exist in the database")
                 st.info("Run 'Create Customer Database' to fix this issue")
             else:
                 st.success("✅ 'customers' table exists in the database")
                 
-                # Count records
-                cursor.execute("SELECT COUNT(*) FROM customers")
-                count = cursor.fetchone()[0]
-                
+                count = summary["count"]
                 if count == 0:
                     st.error("❌ 'customers' table is empty (0 records)")
                     st.info("Run 'Create Customer Database' to populate the database")
                 else:
                     st.success(f"✅ 'customers' table contains {count} records")
                     
-                    # Get mobile type distribution
-                    cursor.execute("SELECT mobile_type, COUNT(*) FROM customers GROUP BY mobile_type")
-                    distribution = cursor.fetchall()
-                    
+                    # Small result sets go to st.dataframe as plain rows, no DataFrame needed
                     st.write("Mobile type distribution:")
-                    dist_df = pd.DataFrame(distribution, columns=["Device Type", "Count"])
-                    st.dataframe(dist_df)
+                    st.dataframe([{"Device Type": device_type, "Count": n} for device_type, n in summary["distribution"]])
                     
                     # Show sample data
                     st.write("Sample customer records:")
-                    cursor.execute("SELECT * FROM customers LIMIT 5")
-                    columns = [desc[0] for desc in cursor.description]
-                    sample_data = cursor.fetchall()
-                    sample_df = pd.DataFrame(sample_data, columns=columns)
-                    st.dataframe(sample_df)
-            
-            # Close connection
-            conn.close()
+                    st.dataframe(summary["sample"])
             
         except sqlite3.Error as e:
             st.error(f"❌ Database error: {e}")
@@ -140,268 +221,175 @@ def run_database_diagnostics():
         st.info(f"File size: {file_size_kb:.2f} KB")
         
         try:
-            # Connect to the database
-            conn = sqlite3.connect(offers_db_path)
-            cursor = conn.cursor()
+            cursor = get_read_conn(offers_db_path).cursor()
             
             # Check if offers table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='offers'")
-            table_exists = cursor.fetchone()
-            
-            if not table_exists:
+            if not cursor.execute(OFFERS_EXISTS_SQL).fetchone():
                 st.error("❌ 'offers' table does not exist in the database")
             else:
                 st.success("✅ 'offers' table exists in the database")
                 
                 # Count records
-                cursor.execute("SELECT COUNT(*) FROM offers")
-                count = cursor.fetchone()[0]
+                count = cursor.execute(OFFERS_COUNT_SQL).fetchone()[0]
                 st.success(f"✅ 'offers' table contains {count} records")
-            
-            # Close connection
-            conn.close()
         
         except sqlite3.Error as e:
             st.error(f"❌ Offers database error: {e}")
 
 def create_customer_database():
     """Create a new customer database with sample data"""
-    # Database path
-    db_path = 'data/customer_database.db'
-    
-    # Ensure data directory exists
-    os.makedirs('data', exist_ok=True)
-    
-    # Progress indicator
-    progress = st.progress(0)
-    status_text = st.empty()
-    
-    status_text.text("Creating new database...")
-    
-    # Remove existing database if it exists
-    if os.path.exists(db_path):
-        try:
-            os.remove(db_path)
-            status_text.text("Removed existing database...")
-        except Exception as e:
-            st.error(f"Error removing existing database: {e}")
-            return
-    
-    progress.progress(10)
-    
-    try:
-        # Create a new database connection
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        status_text.text("Creating tables...")
-        # Create customer table
-        cursor.execute('''
-        CREATE TABLE customers (
-            customer_id TEXT PRIMARY KEY,
-            customer_name TEXT NOT NULL,
-            mobile_number TEXT NOT NULL,
-            email TEXT NOT NULL,
-            mobile_type TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        conn.commit()
-        
-        progress.progress(20)
-        
-        # Simple data for generation
-        first_names = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
-                      "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica"]
-        last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
-                     "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson"]
-        mobile_types = ["iOS", "Android"]
-        email_domains = ["gmail.com", "yahoo.com", "outlook.com", "icloud.com"]
-        
-        status_text.text("Generating customer data...")
-        
-        # Generate customer data
-        total_customers = 1000
-        batch_size = 100
-        
-        for batch_start in range(0, total_customers, batch_size):
-            batch_end = min(batch_start + batch_size, total_customers)
-            status_text.text(f"Generating customers {batch_start+1} to {batch_end}...")
-            
-            customer_data = []
-            for i in range(batch_start, batch_end):
-                customer_id = f"CUST{i+1:06d}"
-                first_name = random.choice(first_names)
-                last_name = random.choice(last_names)
-                customer_name = f"{first_name} {last_name}"
-                mobile_number = f"+1{''.join(random.choices(string.digits, k=10))}"
-                email = f"{first_name.lower()}.{last_name.lower()}{random.randint(1,99)}@{random.choice(email_domains)}"
-                mobile_type = random.choice(mobile_types)
-                
-                customer_data.append((customer_id, customer_name, mobile_number, email, mobile_type))
-            
-            # Insert batch
-            cursor.executemany(
-                "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-                customer_data
-            )
-            conn.commit()
-            
-            # Update progress
-            progress_value = 20 + (batch_end * 70 / total_customers)
-            progress.progress(int(progress_value))
+    # Serialize with the other writers (create/reset/add customer)
+    with WRITE_LOCK:
+        # Database path
+        db_path = 'data/customer_database.db'
         
-        status_text.text("Adding real customer examples...")
+        # Ensure data directory exists
+        os.makedirs('data', exist_ok=True)
         
-        # Add 3 real customers
-        real_customers = [
-            ("CUST901001", "John Smith", "+12025550123", "john.smith@example.com", "iOS"),
-            ("CUST901002", "Mary Johnson", "+16505551234", "mary.johnson@example.com", "Android"),
-            ("CUST901003", "Robert Davis", "+13125552345", "robert.davis@example.com", "iOS")
-        ]
+        # Progress indicator
+        progress = st.progress(0)
+        status_text = st.empty()
         
-        for customer in real_customers:
-            try:
-                cursor.execute(
-                    "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-                    customer
-                )
-            except sqlite3.IntegrityError:
-                # If ID exists, generate a new ID
-                cursor.execute("SELECT MAX(SUBSTR(customer_id, 5)) FROM customers")
-                max_id = int(cursor.fetchone()[0])
-                new_id = max_id + 1
-                new_customer_id = f"CUST{new_id:06d}"
-                
-                cursor.execute(
-                    "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-                    (new_customer_id, customer[1], customer[2], customer[3], customer[4])
-                )
+        status_text.text("Creating new database...")
         
-        conn.commit()
+        # Drop cached connections/metadata for the old file
+        clear_db_caches()
         
-        progress.progress(95)
+        # Remove existing database if it exists
+        if os.path.exists(db_path):
+            try:
+                remove_db(db_path)
+                status_text.text("Removed existing database...")
+            except Exception as e:
+                st.error(f"Error removing existing database: {e}")
+                return
         
-        # Verify database
-        cursor.execute("SELECT COUNT(*) FROM customers")
-        total_count = cursor.fetchone()[0]
+        progress.progress(10)
         
-        conn.close()
+        try:
+            # Create a new database connection
+            conn = open_db(db_path)
+            cursor = conn.cursor()
         
-        progress.progress(100)
-        status_text.text("")
+            # The file was just deleted and a failed run is simply re-created,
+            # so skip the journal and fsyncs for the bulk load
+            begin_bulk_load(conn)
         
-        st.success(f"✅ Customer database created successfully with {total_count} records!")
-        st.info("You can now use the Customer tab in the main application.")
+            status_text.text("Creating tables...")
+            # Create customer table
+            cursor.execute(CUSTOMERS_TABLE_SQL)
+            conn.commit()
         
-    except Exception as e:
-        st.error(f"Error creating customer database: {e}")
+            progress.progress(20)
+        
+            # Simple data for generation
+            first_names = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+                          "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica"]
+            last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+                         "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson"]
+            mobile_types = ["iOS", "Android"]
+            email_domains = ["gmail.com", "yahoo.com", "outlook.com", "icloud.com"]
+        
+            status_text.text("Generating customer data...")
+        
+            # Generate customer data column-wise with NumPy
+            total_customers = 1000
+            rng = np.random.default_rng()
+            firsts = pd.Series(rng.choice(first_names, total_customers))
+            lasts = pd.Series(rng.choice(last_names, total_customers))
+            phone_numbers = pd.Series(rng.integers(0, 10**10, total_customers)).astype(str).str.zfill(10)
+            suffixes = pd.Series(rng.integers(1, 100, total_customers)).astype(str)
+            domains = pd.Series(rng.choice(email_domains, total_customers))
+        
+            customers_df = pd.DataFrame({
+                "id": np.arange(1, total_customers + 1),
+                "customer_name": firsts + " " + lasts,
+                "mobile_number": "+1" + phone_numbers,
+                "email": firsts.str.lower() + "." + lasts.str.lower() + suffixes + "@" + domains,
+                "mobile_type": rng.choice(mobile_types, total_customers)
+            })
+        
+            progress.progress(80)
+        
+            status_text.text("Inserting customers...")
+        
+            # Add 3 real customers (keys are outside the generated range)
+            real_customers = [
+                (901001, "John Smith", "+12025550123", "john.smith@example.com", "iOS"),
+                (901002, "Mary Johnson", "+16505551234", "mary.johnson@example.com", "Android"),
+                (901003, "Robert Davis", "+13125552345", "robert.davis@example.com", "iOS")
+            ]
+        
+            # Insert generated and real customers in a single transaction (one fsync)
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.executemany(
+                "INSERT INTO customers (id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
+                # Rows are streamed to SQLite without an intermediate list
+                chain(customers_df.itertuples(index=False, name=None), real_customers)
+            )
 
-def reset_customer_database():
-    """Reset (delete) the customer database"""
-    # Database path
-    db_path = 'data/customer_database.db'
-    
-    if not os.path.exists(db_path):
-        st.warning("Customer database does not exist - nothing to reset")
-        return
-    
-    try:
-        os.remove(db_path)
-        st.success("✅ Customer database has been reset")
-        st.info("You can create a new database using the 'Create Customer Database' button")
-    except Exception as e:
-        st.error(f"Error resetting database: {e}")
+            # Index after the bulk load so rows are not indexed one at a time;
+            # lets the mobile_type GROUP BY be answered from the index alone
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_mobile_type ON customers(mobile_type)")
 
-def explore_customer_database():
-    """Explore customer database contents"""
-    # Database path
-    db_path = 'data/customer_database.db'
-    
-    if not os.path.exists(db_path):
-        st.warning("Customer database does not exist")
-        return
-    
-    try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        
-        # Get table list
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [table[0] for table in cursor.fetchall()]
-        
-        if not tables:
-            st.warning("No tables found in the database")
-            return
-        
-        # Let user select a table
-        selected_table = st.selectbox("Select Table", tables)
-        
-        # Show table schema
-        cursor.execute(f"PRAGMA table_info({selected_table})")
-        schema = cursor.fetchall()
-        
-        st.subheader("Table Schema")
-        schema_df = pd.DataFrame(schema, columns=["cid", "name", "type", "notnull", "dflt_value", "pk"])
-        st.dataframe(schema_df[["name", "type", "notnull", "pk"]])
-        
-        # Show table data
-        st.subheader("Table Data")
-        limit = st.slider("Number of rows to display", 5, 100, 10)
+            conn.commit()
+            end_bulk_load(conn)
+            
+            # Collect planner statistics for the freshly built index
+            cursor.execute("ANALYZE")
         
-        query = f"SELECT * FROM {selected_table} LIMIT {limit}"
-        table_data = pd.read_sql_query(query, conn)
+            progress.progress(95)
         
-        st.dataframe(table_data)
+            # Verify database
+            cursor.execute("SELECT COUNT(*) FROM customers")
+            total_count = cursor.fetchone()[0]
         
-        # Table statistics
-        st.subheader("Table Statistics")
+            close_db(conn)
         
-        cursor.execute(f"SELECT COUNT(*) FROM {selected_table}")
-        row_count = cursor.fetchone()[0]
+            progress.progress(100)
+            status_text.text("")
         
-        st.metric("Total Rows", row_count)
+            st.success(f"✅ Customer database created successfully with {total_count} records!")
+            st.info("You can now use the Customer tab in the main application.")
         
-        if selected_table == "customers":
-            # Mobile type distribution
-            cursor.execute("SELECT mobile_type, COUNT(*) FROM customers GROUP BY mobile_type")
-            distribution = cursor.fetchall()
-            
-            dist_df = pd.DataFrame(distribution, columns=["Device Type", "Count"])
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("Mobile Type Distribution")
-                st.dataframe(dist_df)
-            
-            with col2:
-                st.write("Distribution Chart")
-                st.bar_chart(dist_df.set_index("Device Type"))
+        except Exception as e:
+            st.error(f"Error creating customer database: {e}")
+
+def reset_customer_database():
+    """Reset (delete) the customer database"""
+    # Serialize with the other writers (create/reset/add customer)
+    with WRITE_LOCK:
+        # Database path
+        db_path = 'data/customer_database.db'
         
-        conn.close()
+        if not os.path.exists(db_path):
+            st.warning("Customer database does not exist - nothing to reset")
+            return
         
-    except Exception as e:
-        st.error(f"Error exploring database: {e}")
+        try:
+            clear_db_caches()
+            remove_db(db_path)
+            st.success("✅ Customer database has been reset")
+            st.info("You can create a new database using the 'Create Customer Database' button")
+        except Exception as e:
+            st.error(f"Error resetting database: {e}")
 
-def explore_offers_database():
-    """Explore offers database contents"""
-    # Database path
-    db_path = 'data/offers_database.db'
-    
+# Distribution columns the explorer may chart: column -> (table, label, title)
+STATS_COLUMNS = {
+    "mobile_type": ("customers", "Device Type", "Mobile Type Distribution"),
+    "type": ("offers", "Offer Type", "Offer Type Distribution"),
+}
+
+@fragment
+def explore_db(db_path, stats_column=None, label="Database"):
+    """Explore the contents of a database, charting stats_column of its main table"""
     if not os.path.exists(db_path):
-        st.warning("Offers database does not exist")
+        st.warning(f"{label} database does not exist")
         return
     
     try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        
         # Get table list
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [table[0] for table in cursor.fetchall()]
+        tables = list_tables(db_path)
         
         if not tables:
             st.warning("No tables found in the database")
@@ -411,49 +399,43 @@ def explore_offers_database():
         selected_table = st.selectbox("Select Table", tables)
         
         # Show table schema
-        cursor.execute(f"PRAGMA table_info({selected_table})")
-        schema = cursor.fetchall()
+        schema_df = get_schema(db_path, selected_table)
         
         st.subheader("Table Schema")
-        schema_df = pd.DataFrame(schema, columns=["cid", "name", "type", "notnull", "dflt_value", "pk"])
         st.dataframe(schema_df[["name", "type", "notnull", "pk"]])
         
         # Show table data
         st.subheader("Table Data")
         limit = st.slider("Number of rows to display", 5, 100, 10)
         
-        query = f"SELECT * FROM {selected_table} LIMIT {limit}"
-        table_data = pd.read_sql_query(query, conn)
+        table_data = fetch_head(db_path, selected_table)
         
-        st.dataframe(table_data)
+        st.dataframe(table_data.head(limit))
         
         # Table statistics
         st.subheader("Table Statistics")
         
-        cursor.execute(f"SELECT COUNT(*) FROM {selected_table}")
-        row_count = cursor.fetchone()[0]
+        row_count = count_rows(db_path, selected_table)
         
         st.metric("Total Rows", row_count)
         
-        if selected_table == "offers":
-            # Type distribution
-            cursor.execute("SELECT type, COUNT(*) FROM offers GROUP BY type")
-            distribution = cursor.fetchall()
+        # Only whitelisted columns are ever interpolated into the GROUP BY
+        stats_table, stats_label, stats_title = STATS_COLUMNS.get(stats_column, (None, None, None))
+        if selected_table == stats_table:
+            distribution = get_distribution(db_path, stats_table, stats_column)
             
             if distribution:
-                dist_df = pd.DataFrame(distribution, columns=["Offer Type", "Count"])
+                dist_df = pd.DataFrame(distribution, columns=[stats_label, "Count"])
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    st.write("Offer Type Distribution")
+                    st.write(stats_title)
                     st.dataframe(dist_df)
                 
                 with col2:
                     st.write("Distribution Chart")
-                    st.bar_chart(dist_df.set_index("Offer Type"))
-        
-        conn.close()
+                    st.bar_chart(dist_df.set_index(stats_label))
         
     except Exception as e:
         st.error(f"Error exploring database: {e}")
@@ -1,14 +1,17 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from functools import lru_cache
 import json
 import requests
-from tqdm import tqdm
 import os
+from db_utils import OFFER_COLUMNS, OFFERS_TABLE_SQL, WRITE_LOCK, close_db, create_offers_indexes, db_mtime, ensure_offer_id_key, ensure_offers_indexes, iter_csv, open_db
+from streamlit_utils import fragment
 # Import customers module if it exists
 try:
     import customers
@@ -36,6 +39,10 @@ st.set_page_config(
 
 def ensure_database_exists():
     """Ensure the database exists, creating it if necessary"""
+    # Checked once per session; later reruns skip the filesystem check
+    if st.session_state.get("offers_db_ready"):
+        return
+    
     if not os.path.exists("offers_database.db"):
         st.info("Database not found. Generating dummy database...")
         
@@ -46,8 +53,8 @@ def ensure_database_exists():
             
             # Generate and save data
             with st.spinner("Generating 10,000 dummy offers..."):
-                df = generate_dummy_data()
-                create_database(df)
+                offers = generate_dummy_data()
+                create_database(offers)
                 st.success("Database created successfully!")
         except ImportError:
             # Option 2: Generate data inline if import fails
@@ -57,11 +64,9 @@ def ensure_database_exists():
             def quick_generate_dummy_data():
                 """Generate a smaller set of dummy data"""
                 import pandas as pd
-                import random
-                import datetime
+                import numpy as np
                 import uuid
                 
-                data = []
                 merchants = [
                     "Amazon", "Flipkart", "Swiggy", "Zomato", "BigBasket", 
                     "MakeMyTrip", "BookMyShow", "Myntra", "Ajio", "Nykaa"
@@ -69,113 +74,230 @@ def ensure_database_exists():
                 categories = ["Shopping", "Food", "Travel", "Fashion", "Grocery"]
                 offer_types = ["discount", "cashback", "buy_one_get_one", "free_delivery"]
                 
-                # Generate 1,000 offers for quick testing
-                for _ in range(1000):
-                    merchant = random.choice(merchants)
-                    category = random.choice(categories)
-                    offer_type = random.choice(offer_types)
-                    
-                    offer = {
-                        "offer_id": f"{merchant[:3].upper()}{str(uuid.uuid4())[:8].upper()}",
-                        "merchant": merchant,
-                        "category": category,
-                        "type": offer_type,
-                        "discount_percent": random.choice([10, 15, 20, 25, 30, 40, 50]) if random.random() < 0.7 else None,
-                        "discount_value": random.choice([50, 100, 150, 200, 300]) if random.random() < 0.3 else None,
-                        "minimum_purchase": random.choice([499, 999, 1499, 1999]) if random.random() < 0.6 else None,
-                        "coupon_code": f"SAVE{random.choice([10, 20, 30])}" if random.random() < 0.7 else None,
-                        "description": f"Special offer at {merchant}",
-                        "terms_conditions": "Terms and conditions apply",
-                        "valid_from": (datetime.datetime.now() - datetime.timedelta(days=random.randint(0, 30))).date(),
-                        "valid_until": (datetime.datetime.now() + datetime.timedelta(days=random.randint(15, 90))).date(),
-                        "affiliate_link": f"https://{merchant.lower().replace(' ', '-')}.affiliate.com/offers/{random.randint(1000, 9999)}"
-                    }
-                    data.append(offer)
+                # Generate 1,000 offers for quick testing, column by column
+                n = 1000
+                rng = np.random.default_rng()
+                merchant = pd.Series(rng.choice(merchants, n))
+                
+                def sometimes(values, probability):
+                    """Random picks from values, None where the field is absent"""
+                    picks = pd.Series(rng.choice(values, n).tolist(), dtype=object)
+                    return picks.where(rng.random(n) < probability, None)
                 
-                return pd.DataFrame(data)
+                today = np.datetime64('today', 'D')
+                uuid_prefixes = pd.Series([uuid.uuid4().hex[:8].upper() for _ in range(n)])
+                
+                return pd.DataFrame({
+                    "offer_id": merchant.str[:3].str.upper() + uuid_prefixes,
+                    "merchant": merchant,
+                    "category": rng.choice(categories, n),
+                    "type": rng.choice(offer_types, n),
+                    "discount_percent": sometimes([10, 15, 20, 25, 30, 40, 50], 0.7),
+                    "discount_value": sometimes([50, 100, 150, 200, 300], 0.3),
+                    "minimum_purchase": sometimes([499, 999, 1499, 1999], 0.6),
+                    "coupon_code": sometimes(["SAVE10", "SAVE20", "SAVE30"], 0.7),
+                    "description": "Special offer at " + merchant,
+                    "terms_conditions": "Terms and conditions apply",
+                    "valid_from": np.datetime_as_string(today - rng.integers(0, 31, n).astype('timedelta64[D]'), unit='D'),
+                    "valid_until": np.datetime_as_string(today + rng.integers(15, 91, n).astype('timedelta64[D]'), unit='D'),
+                    "affiliate_link": "https://" + merchant.str.lower().str.replace(' ', '-') + ".affiliate.com/offers/"
+                                      + pd.Series(rng.integers(1000, 10000, n)).astype(str)
+                })
             
-            # Create database with simplified data
-            conn = sqlite3.connect("offers_database.db")
+            # Create database with simplified data, keyed like create_database
+            # builds it: one insert transaction, then the indices
             df = quick_generate_dummy_data()
-            df.to_sql('offers', conn, if_exists='replace', index=False)
-            
-            # Create indices
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_merchant ON offers (merchant)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_category ON offers (category)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_type ON offers (type)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_valid_dates ON offers (valid_from, valid_until)')
-            
-            conn.close()
+            conn = open_db("offers_database.db")
+            try:
+                with WRITE_LOCK, conn:
+                    conn.execute(OFFERS_TABLE_SQL)
+                    conn.executemany(
+                        f"INSERT INTO offers ({', '.join(OFFER_COLUMNS)}) VALUES ({', '.join('?' * len(OFFER_COLUMNS))})",
+                        df[list(OFFER_COLUMNS)].itertuples(index=False, name=None)
+                    )
+                    create_offers_indexes(conn)
+            finally:
+                close_db(conn)
             st.success("Database created with 1,000 sample offers!")
+    
+    st.session_state["offers_db_ready"] = True
 
 # Database connection helper
-def get_db_connection(db_path="offers_database.db"):
-    """Create a database connection"""
-    conn = sqlite3.connect(db_path)
+@st.cache_resource
+def get_conn(db_path="offers_database.db"):
+    """Get a database connection shared across reruns and sessions"""
+    # WAL lets this long-lived reader coexist with the generator/API writers
+    # Room in the statement cache for every filter shape of every dashboard query
+    conn = open_db(db_path, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row  # This enables column access by name
+    ensure_offers_indexes(conn)
     return conn
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def load_data(_conn, filters=None):
-    """Load data from database with optional filters"""
-    query = "SELECT * FROM offers"
+# Conditions for each sidebar filter, in the order of the filter shape below
+FILTER_CONDITIONS = (
+    "merchant = ?",
+    "category = ?",
+    "type = ?",
+    "(discount_percent >= ? OR discount_value >= ?)",
+    # Dates are stored as ISO text, so comparing the bare columns keeps the
+    # predicate on idx_valid_dates
+    "valid_from <= ? AND valid_until >= ?",
+)
+
+@lru_cache(maxsize=None)
+def where_template(shape):
+    """WHERE clause for a filter shape (which filters are set); at most 32 are ever built"""
+    conditions = [condition for condition, used in zip(FILTER_CONDITIONS, shape) if used]
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+def build_where_clause(merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None):
+    """Build the WHERE clause and parameters for the sidebar filters"""
+    has_merchant = bool(merchant) and merchant != 'All'
+    has_category = bool(category) and category != 'All'
+    has_type = bool(offer_type) and offer_type != 'All'
+    shape = (has_merchant, has_category, has_type, bool(min_discount), bool(valid_on_date))
+    
     params = []
+    if has_merchant:
+        params.append(merchant)
+    if has_category:
+        params.append(category)
+    if has_type:
+        params.append(offer_type)
+    if min_discount:
+        params.extend([min_discount, min_discount * 10])  # Approximate conversion
+    if valid_on_date:
+        params.extend([valid_on_date, valid_on_date])
     
-    if filters:
-        conditions = []
-        
-        # Apply merchant filter
-        if filters.get('merchant') and filters['merchant'] != 'All':
-            conditions.append("merchant = ?")
-            params.append(filters['merchant'])
-        
-        # Apply category filter
-        if filters.get('category') and filters['category'] != 'All':
-            conditions.append("category = ?")
-            params.append(filters['category'])
-        
-        # Apply offer type filter
-        if filters.get('offer_type') and filters['offer_type'] != 'All':
-            conditions.append("type = ?")
-            params.append(filters['offer_type'])
-        
-        # Apply min discount filter
-        if filters.get('min_discount'):
-            conditions.append("(discount_percent >= ? OR discount_value >= ?)")
-            params.extend([filters['min_discount'], filters['min_discount'] * 10])  # Approximate conversion
-        
-        # Apply date filter
-        if filters.get('valid_on_date'):
-            conditions.append("date(valid_from) <= date(?) AND date(valid_until) >= date(?)")
-            params.extend([filters['valid_on_date'], filters['valid_on_date']])
-        
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+    return where_template(shape), params
+
+# Offer label columns with only a few distinct values each
+CATEGORY_COLUMNS = ('merchant', 'category', 'type')
+
+# Filters are plain scalars so the cache keys are cheap to hash
+@st.cache_data(ttl=300, max_entries=128)  # Cache for 5 minutes
+def load_data(merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None, columns=None):
+    """Load data from database with optional filters, limited to a tuple of columns if given"""
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    columns = columns or OFFER_COLUMNS
+    unknown = set(columns) - set(OFFER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown offer columns: {', '.join(sorted(unknown))}")
     
-    # Execute query
-    df = pd.read_sql_query(query, _conn, params=params)
+    # Execute query; dates are parsed once here rather than in every tab
+    date_format = {'format': 'ISO8601'}
+    df = pd.read_sql_query(
+        f"SELECT {', '.join(columns)} FROM offers" + where, get_conn(), params=params,
+        parse_dates={column: date_format for column in ('valid_from', 'valid_until') if column in columns}
+    )
+    
+    # As categoricals the cached frame is smaller and quicker to pickle on every hit
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
     return df
 
-@st.cache_data
-def get_filter_options(_conn):
+@st.cache_data(ttl=300, max_entries=16)
+def offers_csv(merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None):
+    """Filtered offers as UTF-8 CSV bytes, serialized once per filter combination"""
+    # Streamed from the cursor in chunks, without building a DataFrame first
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    cursor = get_conn().execute(f"SELECT {', '.join(OFFER_COLUMNS)} FROM offers" + where, params)
+    return b"".join(iter_csv(cursor))
+
+# Columns the charts may group by (only these are interpolated into SQL)
+GROUP_COLUMNS = ('merchant', 'category', 'type')
+
+@st.cache_data(ttl=300, max_entries=64)
+def agg_by(column, merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None, limit=None):
+    """Count the filtered offers per value of a column, largest groups first"""
+    if column not in GROUP_COLUMNS:
+        raise ValueError(f"Cannot group offers by {column}")
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    query = f"SELECT {column}, COUNT(*) AS count FROM offers{where} GROUP BY {column} ORDER BY count DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return pd.read_sql_query(query, get_conn(), params=params)
+
+@st.cache_data(ttl=300, max_entries=64)
+def avg_discount_by(column, merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None):
+    """Average discount percentage of the filtered offers per value of a column"""
+    if column not in GROUP_COLUMNS:
+        raise ValueError(f"Cannot group offers by {column}")
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    query = (f"SELECT {column}, AVG(discount_percent) AS discount_percent FROM offers{where} "
+             f"GROUP BY {column} ORDER BY discount_percent DESC")
+    return pd.read_sql_query(query, get_conn(), params=params)
+
+# Width of the discount histogram buckets, in percentage points
+DISCOUNT_BUCKET_WIDTH = 5
+
+@st.cache_data(ttl=300, max_entries=64)
+def discount_histogram(merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None):
+    """Filtered offers per discount-percentage bucket (lower bound), binned in SQL"""
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    where += " AND " if where else " WHERE "
+    query = (f"SELECT CAST(discount_percent / {DISCOUNT_BUCKET_WIDTH} AS INTEGER) * {DISCOUNT_BUCKET_WIDTH} AS discount_percent, "
+             f"COUNT(*) AS count FROM offers{where}discount_percent IS NOT NULL GROUP BY 1 ORDER BY 1")
+    return pd.read_sql_query(query, get_conn(), params=params)
+
+@st.cache_data(ttl=300, max_entries=64)
+def monthly_type_counts(merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None):
+    """Filtered offers per start month (rows) and offer type (columns)"""
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    counts = pd.read_sql_query(
+        f"SELECT strftime('%Y-%m', valid_from) AS month, type, COUNT(*) AS count FROM offers{where} GROUP BY month, type",
+        get_conn(), params=params
+    ).dropna(subset=['month', 'type'])
+    return counts.pivot(index='month', columns='type', values='count').fillna(0)
+
+@st.cache_data(ttl=300, max_entries=64)
+def active_offer_deltas(merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None):
+    """Per-day change in active offers: +n on valid_from, -n on the day after valid_until"""
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    query = (
+        f"SELECT valid_from AS date, COUNT(*) AS delta FROM offers{where} GROUP BY valid_from "
+        f"UNION ALL SELECT date(valid_until, '+1 day'), -COUNT(*) FROM offers{where} GROUP BY valid_until"
+    )
+    return pd.read_sql_query(query, get_conn(), params=params * 2, parse_dates={'date': {'format': 'ISO8601'}})
+
+@st.cache_data(ttl=300, max_entries=64)
+def dashboard_metrics(today, merchant='All', category='All', offer_type='All', min_discount=0, valid_on_date=None):
+    """Total offers, unique merchants, average discount and offers expiring within 7 days of today"""
+    where, params = build_where_clause(merchant, category, offer_type, min_discount, valid_on_date)
+    week_ahead = (datetime.fromisoformat(today) + timedelta(days=7)).date().isoformat()
+    query = (
+        "SELECT COUNT(*), COUNT(DISTINCT merchant), AVG(discount_percent), "
+        "COALESCE(SUM(valid_until > ? AND valid_until <= ?), 0) FROM offers" + where
+    )
+    return tuple(get_conn().execute(query, [today, week_ahead] + params).fetchone())
+
+# Each branch groups by walking its column's index, so values come out sorted
+# without temp B-trees
+FILTER_OPTIONS_SQL = """
+SELECT 'merchants', merchant FROM offers GROUP BY merchant
+UNION ALL SELECT 'categories', category FROM offers GROUP BY category
+UNION ALL SELECT 'offer_types', type FROM offers GROUP BY type
+"""
+
+# Shared by reference across reruns (no pickling on a hit); db_mtime keys the
+# entry to the current database file and the tuples keep it read-only
+@st.cache_resource(max_entries=8)
+def get_filter_options(db_path, db_mtime):
     """Get unique values for filters"""
-    merchants = pd.read_sql_query("SELECT DISTINCT merchant FROM offers ORDER BY merchant", _conn)['merchant'].tolist()
-    categories = pd.read_sql_query("SELECT DISTINCT category FROM offers ORDER BY category", _conn)['category'].tolist()
-    offer_types = pd.read_sql_query("SELECT DISTINCT type FROM offers ORDER BY type", _conn)['type'].tolist()
-    
-    return {
-        'merchants': ['All'] + merchants,
-        'categories': ['All'] + categories,
-        'offer_types': ['All'] + offer_types
-    }
-
-# Visualization functions
-def create_offers_by_merchant_chart(data):
-    """Create a bar chart of offers by merchant"""
-    merchant_counts = data['merchant'].value_counts().reset_index()
-    merchant_counts.columns = ['merchant', 'count']
-    merchant_counts = merchant_counts.sort_values('count', ascending=False).head(15)
+    # One statement instead of three round trips
+    options = {'merchants': ['All'], 'categories': ['All'], 'offer_types': ['All']}
+    for key, value in get_conn(db_path).execute(FILTER_OPTIONS_SQL):
+        options[key].append(value)
     
+    return {key: tuple(values) for key, values in options.items()}
+
+# Visualization functions; figures are cached by their input frame, so reruns
+# with unchanged data skip the Plotly Express construction
+@st.cache_data(ttl=300, max_entries=64)
+def create_offers_by_merchant_chart(merchant_counts):
+    """Create a bar chart of offers by merchant from per-merchant counts"""
     fig = px.bar(
         merchant_counts,
         x='merchant',
@@ -193,11 +315,9 @@ def create_offers_by_merchant_chart(data):
     
     return fig
 
-def create_offers_by_type_chart(data):
-    """Create a pie chart of offers by type"""
-    type_counts = data['type'].value_counts().reset_index()
-    type_counts.columns = ['type', 'count']
-    
+@st.cache_data(ttl=300, max_entries=64)
+def create_offers_by_type_chart(type_counts):
+    """Create a pie chart of offers by type from per-type counts"""
     fig = px.pie(
         type_counts,
         values='count',
@@ -211,12 +331,9 @@ def create_offers_by_type_chart(data):
     
     return fig
 
-def create_offers_by_category_chart(data):
-    """Create a bar chart of offers by category"""
-    category_counts = data['category'].value_counts().reset_index()
-    category_counts.columns = ['category', 'count']
-    category_counts = category_counts.sort_values('count', ascending=False)
-    
+@st.cache_data(ttl=300, max_entries=64)
+def create_offers_by_category_chart(category_counts):
+    """Create a bar chart of offers by category from per-category counts"""
     fig = px.bar(
         category_counts,
         x='category',
@@ -235,22 +352,22 @@ def create_offers_by_category_chart(data):
     
     return fig
 
-def create_discount_distribution_chart(data):
-    """Create a histogram of discount percentages"""
-    # Filter out None values
-    discount_data = data[data['discount_percent'].notna()]
-    
-    if len(discount_data) > 0:
-        fig = px.histogram(
-            discount_data,
+@st.cache_data(ttl=300, max_entries=64)
+def create_discount_distribution_chart(discount_counts):
+    """Create a histogram of discount percentages from per-bucket counts"""
+    if len(discount_counts) > 0:
+        fig = px.bar(
+            discount_counts,
             x='discount_percent',
-            nbins=20,
+            y='count',
             title='Distribution of Discount Percentages',
             labels={'discount_percent': 'Discount Percentage', 'count': 'Number of Offers'},
             color_discrete_sequence=['#3366CC']
         )
         
-        fig.update_layout(bargap=0.1, height=400)
+        # Each bar spans its bucket, leaving a small gap as in a histogram
+        fig.update_traces(offset=0, width=DISCOUNT_BUCKET_WIDTH * 0.9)
+        fig.update_layout(height=400)
         return fig
     else:
         # Create empty chart if no data
@@ -263,30 +380,17 @@ def create_discount_distribution_chart(data):
         fig.update_layout(height=400)
         return fig
 
-def create_offers_timeline_chart(data):
-    """Create a timeline of offers"""
-    # Convert strings to datetime
-    data['valid_from'] = pd.to_datetime(data['valid_from'])
-    data['valid_until'] = pd.to_datetime(data['valid_until'])
-    
-    # Group by date and count
-    timeline_data = (
-        pd.DataFrame({
-            'date': pd.date_range(
-                start=data['valid_from'].min(),
-                end=data['valid_until'].max(),
-                freq='D'
-            )
-        })
-    )
+@st.cache_data(ttl=300, max_entries=64)
+def create_offers_timeline_chart(deltas):
+    """Create a timeline of offers from per-day changes in active offers"""
+    starts = deltas.loc[deltas['delta'] > 0, 'date']
+    ends = deltas.loc[deltas['delta'] < 0, 'date']
+    dates = pd.date_range(start=starts.min(), end=ends.max() - pd.Timedelta(days=1), freq='D')
     
-    # Count active offers for each date
-    timeline_data['active_offers'] = timeline_data['date'].apply(
-        lambda date: sum(
-            (data['valid_from'] <= date) & 
-            (data['valid_until'] >= date)
-        )
-    )
+    # Count active offers for each date as the running total of the changes
+    active_offers = deltas.groupby('date')['delta'].sum().cumsum().reindex(dates, method='ffill').fillna(0)
+    
+    timeline_data = pd.DataFrame({'date': dates, 'active_offers': active_offers.astype(int).values})
     
     # Create timeline chart
     fig = px.line(
@@ -301,30 +405,59 @@ def create_offers_timeline_chart(data):
     fig.update_layout(height=450)
     return fig
 
+@st.cache_data(ttl=300, max_entries=64)
+def create_correlation_chart(corr_data, max_points=2000):
+    """Create a scatter of minimum purchase vs. discount with a least-squares trendline"""
+    # Fit on all points, but only draw a sample of them (WebGL instead of SVG markers)
+    slope, intercept = np.polyfit(corr_data['minimum_purchase'], corr_data['discount_percent'], 1)
+    sample = corr_data.sample(min(max_points, len(corr_data)), random_state=0)
+    
+    fig = px.scatter(
+        sample,
+        x='minimum_purchase',
+        y='discount_percent',
+        title='Correlation between Minimum Purchase and Discount Percentage',
+        labels={
+            'minimum_purchase': 'Minimum Purchase (₹)',
+            'discount_percent': 'Discount Percentage (%)'
+        },
+        render_mode='webgl'
+    )
+    
+    x_range = np.array([corr_data['minimum_purchase'].min(), corr_data['minimum_purchase'].max()])
+    fig.add_scatter(x=x_range, y=slope * x_range + intercept, mode='lines', name='OLS trendline')
+    return fig
+
 # API Integration Functions
+API_URL = "https://api.coupomated.com/coupons"
+
+@st.cache_resource
+def get_api_session():
+    """HTTP session shared across reruns so connections (TCP/TLS) are reused"""
+    return requests.Session()
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=16)
+def fetch_api_payload(api_key):
+    """Fetch and parse the offers payload; failures raise, so they are never cached"""
+    response = get_api_session().get(API_URL, headers={"Authorization": f"Bearer {api_key}"})
+    if response.status_code != 200:
+        raise requests.HTTPError(f"{response.status_code} - {response.text}")
+    return response.json()
+
 def fetch_offers_from_api(api_key):
     """Fetch offers from Coupomated API"""
-    url = "https://api.coupomated.com/coupons"
-    headers = {"Authorization": f"Bearer {api_key}"}
-    
     try:
         with st.spinner("Fetching offers from API..."):
-            response = requests.get(url, headers=headers)
-            
-            # Check if the request was successful
-            if response.status_code == 200:
-                return response.json()
-            else:
-                st.error(f"API Error: {response.status_code} - {response.text}")
-                return []
+            return fetch_api_payload(api_key)
+    except requests.HTTPError as e:
+        st.error(f"API Error: {e}")
+        return []
     except Exception as e:
         st.error(f"Error fetching data: {e}")
         return []
 
 def normalize_api_data(api_response):
-    """Normalize API response to match our database schema"""
-    normalized_data = []
-    
+    """Normalize API response to a DataFrame matching our database schema"""
     try:
         # Handle different possible API response structures
         if isinstance(api_response, list):
@@ -336,63 +469,274 @@ def normalize_api_data(api_response):
         else:
             offers = [api_response]  # Single offer
         
-        for offer in offers:
-            # Map API fields to our schema
-            normalized_offer = {
-                "offer_id": offer.get('offer_id') or offer.get('id') or f"API_{len(normalized_data)}",
-                "merchant": offer.get('merchant') or offer.get('store_name') or "Unknown",
-                "category": offer.get('category') or "Uncategorized",
-                "type": offer.get('type') or offer.get('offer_type') or "discount",
-                "discount_percent": offer.get('discount_percent'),
-                "discount_value": offer.get('discount_value') or offer.get('amount'),
-                "minimum_purchase": offer.get('minimum_purchase') or offer.get('min_purchase'),
-                "coupon_code": offer.get('coupon_code') or offer.get('code'),
-                "description": offer.get('description') or offer.get('title') or "No description available",
-                "terms_conditions": offer.get('terms_conditions') or offer.get('terms') or "Terms and conditions apply",
-                "valid_from": offer.get('valid_from') or offer.get('start_date') or datetime.now().date().isoformat(),
-                "valid_until": offer.get('valid_until') or offer.get('end_date') or (datetime.now() + timedelta(days=30)).date().isoformat(),
-                "affiliate_link": offer.get('affiliate_link') or offer.get('link') or ""
-            }
-            normalized_data.append(normalized_offer)
+        # object dtype keeps the API values as given (an int id stays 17, not 17.0)
+        raw = pd.DataFrame(offers, dtype=object)
         
-        return normalized_data
+        def first_of(*columns, default=None):
+            """Column-wise `a or b or default`: the first truthy value per row, else the last candidate"""
+            if default is None:
+                # Like `a or b`: when nothing is truthy the last column's value is kept (e.g. 0 or '')
+                *columns, last = columns
+                result = raw[last] if last in raw else pd.Series(None, index=raw.index, dtype=object)
+            else:
+                result = pd.Series(default, index=raw.index, dtype=object)
+            for column in reversed(columns):
+                if column in raw:
+                    values = raw[column]
+                    result = values.where(values.notna() & values.astype(bool), result)
+            return result
+        
+        today = datetime.now().date()
+        
+        # Map API fields to our schema
+        return pd.DataFrame({
+            "offer_id": first_of('offer_id', 'id', default="API_" + raw.index.to_series().astype(str)),
+            "merchant": first_of('merchant', 'store_name', default="Unknown"),
+            "category": first_of('category', default="Uncategorized"),
+            "type": first_of('type', 'offer_type', default="discount"),
+            "discount_percent": raw['discount_percent'] if 'discount_percent' in raw else None,
+            "discount_value": first_of('discount_value', 'amount'),
+            "minimum_purchase": first_of('minimum_purchase', 'min_purchase'),
+            "coupon_code": first_of('coupon_code', 'code'),
+            "description": first_of('description', 'title', default="No description available"),
+            "terms_conditions": first_of('terms_conditions', 'terms', default="Terms and conditions apply"),
+            "valid_from": first_of('valid_from', 'start_date', default=today.isoformat()),
+            "valid_until": first_of('valid_until', 'end_date', default=(today + timedelta(days=30)).isoformat()),
+            "affiliate_link": first_of('affiliate_link', 'link', default="")
+        }, index=raw.index)
     except Exception as e:
         st.error(f"Error normalizing API data: {e}")
         return []
 
 def save_api_data_to_db(offers, db_path="offers_database.db"):
     """Save API data to database"""
-    if not offers:
+    if offers is None or len(offers) == 0:
         return False
     
     try:
-        conn = sqlite3.connect(db_path)
-        df = pd.DataFrame(offers)
-        
-        # Convert date strings to proper format if needed
-        for date_col in ['valid_from', 'valid_until']:
-            if date_col in df.columns:
-                df[date_col] = pd.to_datetime(df[date_col]).dt.date
-        
-        # Insert data
-        df.to_sql('offers', conn, if_exists='replace', index=False)
-        
-        # Create indices
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_merchant ON offers (merchant)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_category ON offers (category)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_type ON offers (type)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_valid_dates ON offers (valid_from, valid_until)')
-        
-        conn.close()
+        df = pd.DataFrame(offers, columns=list(OFFER_COLUMNS))
+        
+        # Store dates as ISO text; dates in other layouts (e.g. 03/15/2025) are
+        # parsed one by one, and unreadable ones get the normalize_api_data defaults
+        today = datetime.now().date()
+        for date_col, default in (('valid_from', today), ('valid_until', today + timedelta(days=30))):
+            dates = pd.to_datetime(df[date_col], format='ISO8601', errors='coerce')
+            other = dates.isna() & df[date_col].notna()
+            if other.any():
+                dates[other] = pd.to_datetime(df.loc[other, date_col], format='mixed', errors='coerce')
+            unreadable = dates.isna()
+            if unreadable.any():
+                st.warning(f"{unreadable.sum()} offers have an unreadable {date_col}; using {default.isoformat()}")
+            df[date_col] = dates.dt.strftime('%Y-%m-%d').where(~unreadable, default.isoformat())
+        
+        # Bind missing values as NULL
+        df = df.astype(object).where(df.notna(), None)
+        
+        conn = open_db(db_path)
+        try:
+            # Upsert in one transaction; existing indexes are maintained incrementally
+            updates = ", ".join(f"{col} = excluded.{col}" for col in OFFER_COLUMNS[1:])
+            with WRITE_LOCK, conn:
+                # Tables written by older versions via to_sql have no primary key,
+                # so make sure offer_id is unique before upserting on it
+                conn.execute(OFFERS_TABLE_SQL)
+                ensure_offer_id_key(conn)
+                conn.executemany(
+                    f"INSERT INTO offers ({', '.join(OFFER_COLUMNS)}) VALUES ({', '.join('?' * len(OFFER_COLUMNS))}) "
+                    f"ON CONFLICT(offer_id) DO UPDATE SET {updates}",
+                    df.itertuples(index=False, name=None)
+                )
+            
+            # Create indices
+            ensure_offers_indexes(conn)
+        finally:
+            close_db(conn)
         return True
     except Exception as e:
         st.error(f"Error saving API data to database: {e}")
         return False
 
+# Views of the main page. The offers views are fragments, so a widget inside one
+# (e.g. the offer details picker) reruns just that view, not the whole page
+VIEWS = ["📊 Dashboard", "📋 Data Explorer", "📈 Analytics", "👥 Customers", "💳 Transactions"]
+
+@fragment
+def show_dashboard_tab(filters, today):
+    """Render the KPI row and dashboard charts for an ISO date today"""
+    # Top metrics row; same cache entry as the sidebar count
+    col1, col2, col3, col4 = st.columns(4)
+    total_offers, merchant_count, avg_discount, expiring_soon = dashboard_metrics(today, **filters)
+    
+    with col1:
+        st.metric(
+            label="Total Offers", 
+            value=total_offers,
+            delta=None
+        )
+    
+    with col2:
+        st.metric(
+            label="Unique Merchants", 
+            value=merchant_count,
+            delta=None
+        )
+    
+    with col3:
+        st.metric(
+            label="Avg. Discount", 
+            value=f"{avg_discount:.1f}%" if avg_discount is not None else "N/A",
+            delta=None
+        )
+    
+    with col4:
+        # Offers expiring soon (within 7 days)
+        st.metric(
+            label="Expiring Soon", 
+            value=expiring_soon,
+            delta=None
+        )
+    
+    # Charts
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Offers by merchant chart
+        st.plotly_chart(create_offers_by_merchant_chart(agg_by('merchant', limit=15, **filters)), use_container_width=True)
+        
+        # Offers by category chart
+        st.plotly_chart(create_offers_by_category_chart(agg_by('category', **filters)), use_container_width=True)
+    
+    with col2:
+        # Offers by type chart
+        st.plotly_chart(create_offers_by_type_chart(agg_by('type', **filters)), use_container_width=True)
+        
+        # Discount distribution chart
+        st.plotly_chart(create_discount_distribution_chart(discount_histogram(**filters)), use_container_width=True)
+    
+    # Full width charts
+    st.plotly_chart(create_offers_timeline_chart(active_offer_deltas(**filters)), use_container_width=True)
+
+@fragment
+def show_data_explorer_tab(filters):
+    """Render the offers table, CSV export and offer details"""
+    df = load_data(**filters)
+    
+    # Display data table; st.dataframe virtualizes scrolling, a Styler would
+    # build CSS for every cell of the frame on each rerun
+    st.dataframe(df, height=600)
+    
+    # Export functionality
+    st.download_button(
+        label="Download Data as CSV",
+        data=offers_csv(**filters),
+        file_name="merchant_offers_export.csv",
+        mime="text/csv"
+    )
+    
+    # Offer details section
+    st.subheader("Offer Details")
+    offer_ids = df['offer_id'].tolist()
+    selected_offer_id = st.selectbox("Select an offer to view details", offer_ids)
+    
+    if selected_offer_id:
+        # Read the selected row by position instead of masking the whole frame
+        offer_details = df.iloc[offer_ids.index(selected_offer_id)]
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown(f"**Merchant:** {offer_details['merchant']}")
+            st.markdown(f"**Category:** {offer_details['category']}")
+            st.markdown(f"**Offer Type:** {offer_details['type']}")
+            
+            if not pd.isna(offer_details['discount_percent']):
+                st.markdown(f"**Discount:** {offer_details['discount_percent']}%")
+            elif not pd.isna(offer_details['discount_value']):
+                st.markdown(f"**Discount Value:** ₹{offer_details['discount_value']}")
+            
+            if not pd.isna(offer_details['minimum_purchase']):
+                st.markdown(f"**Minimum Purchase:** ₹{offer_details['minimum_purchase']}")
+            
+            if not pd.isna(offer_details['coupon_code']):
+                st.code(offer_details['coupon_code'], language="")
+        
+        with col2:
+            st.markdown(f"**Valid From:** {offer_details['valid_from']:%Y-%m-%d}")
+            st.markdown(f"**Valid Until:** {offer_details['valid_until']:%Y-%m-%d}")
+            
+            if not pd.isna(offer_details['affiliate_link']):
+                st.markdown(f"**Affiliate Link:** {offer_details['affiliate_link']}")
+        
+        st.markdown("### Description")
+        st.markdown(offer_details['description'])
+        
+        st.markdown("### Terms and Conditions")
+        st.markdown(offer_details['terms_conditions'])
+
+@fragment
+def show_analytics_tab(filters):
+    """Render the analytics charts"""
+    df = load_data(columns=('minimum_purchase', 'discount_percent'), **filters)
+    
+    st.subheader("Offers Analytics")
+    
+    # Top merchants by offer count
+    st.markdown("#### Top Merchants by Offer Count")
+    top_merchants = agg_by('merchant', limit=10, **filters).set_index('merchant')['count']
+    st.bar_chart(top_merchants)
+    
+    # Offer type distribution over time
+    st.markdown("#### Offer Type Distribution Over Time")
+    
+    # Offers per start month and type, counted in SQL
+    type_time_dist = monthly_type_counts(**filters)
+    
+    # Only show if we have time-based data
+    if not type_time_dist.empty and len(type_time_dist) > 1:
+        st.line_chart(type_time_dist)
+    else:
+        st.info("Not enough time-based data to show distribution over time")
+    
+    # Discount analysis
+    st.markdown("#### Discount Analysis by Category")
+    
+    # Group by category and calculate average discount
+    discount_by_category = avg_discount_by('category', **filters).set_index('category')['discount_percent']
+    
+    # Show the analysis
+    if not discount_by_category.empty:
+        st.bar_chart(discount_by_category)
+    else:
+        st.info("Not enough discount data available for analysis")
+    
+    # Correlation analysis
+    st.markdown("#### Correlation: Minimum Purchase vs. Discount")
+    
+    # Filter for rows with both values present
+    corr_data = df[['minimum_purchase', 'discount_percent']].dropna()
+    
+    if len(corr_data) > 5:
+        st.plotly_chart(create_correlation_chart(corr_data), use_container_width=True)
+        
+        # Calculate correlation coefficient
+        correlation = np.corrcoef(corr_data['minimum_purchase'], corr_data['discount_percent'])[0, 1]
+        st.markdown(f"**Correlation Coefficient:** {correlation:.2f}")
+        
+        if correlation > 0.5:
+            st.success("Strong positive correlation: Higher minimum purchase amounts tend to offer larger discounts")
+        elif correlation < -0.5:
+            st.success("Strong negative correlation: Lower minimum purchase amounts tend to offer larger discounts")
+        else:
+            st.info("No strong correlation between minimum purchase amount and discount percentage")
+    else:
+        st.info("Not enough data points to perform correlation analysis")
+
 # Main Application
 def main():
     # Ensure database exists
     ensure_database_exists()
+    # One date for the whole rerun, so every query is keyed to the same day
+    today = datetime.now().date()
     # App title with company logo/icon
     st.title("🏷️ Merchant Offers Dashboard")
     st.markdown("### Real-time Database for Merchant Offers & Promotions")
@@ -424,7 +768,7 @@ def main():
                         # Normalize API data
                         normalized_data = normalize_api_data(api_data)
                         
-                        if normalized_data:
+                        if len(normalized_data):
                             # Save to database
                             if save_api_data_to_db(normalized_data):
                                 st.success(f"Successfully saved {len(normalized_data)} offers to database")
@@ -440,8 +784,8 @@ def main():
                     st.error("Please enter your API key")
                 else:
                     try:
-                        response = requests.get(
-                            "https://api.coupomated.com/coupons", 
+                        response = get_api_session().get(
+                            API_URL, 
                             headers={"Authorization": f"Bearer {api_key}"}
                         )
                         st.write("Status Code:", response.status_code)
@@ -461,8 +805,8 @@ def main():
                     with st.spinner("Generating dummy database with 10,000 offers..."):
                         # Execute the data generator script inline
                         from generate_dummy_data import generate_dummy_data, create_database
-                        df = generate_dummy_data()
-                        create_database(df)
+                        offers = generate_dummy_data()
+                        create_database(offers)
                         st.success("Successfully generated dummy database!")
                         st.rerun()  # Refresh the app
                 except Exception as e:
@@ -475,10 +819,8 @@ def main():
         # Filters section
         st.subheader("Filters")
         
-        # Connect to database
         try:
-            conn = get_db_connection()
-            filter_options = get_filter_options(conn)
+            filter_options = get_filter_options("offers_database.db", db_mtime("offers_database.db"))
             
             # Create filters
             selected_merchant = st.selectbox("Merchant", filter_options['merchants'])
@@ -487,9 +829,9 @@ def main():
             min_discount = st.slider("Minimum Discount %", 0, 100, 0)
             valid_on_date = st.date_input(
                 "Offers Valid On", 
-                datetime.now().date(),
-                min_value=datetime.now().date() - timedelta(days=30),
-                max_value=datetime.now().date() + timedelta(days=180)
+                today,
+                min_value=today - timedelta(days=30),
+                max_value=today + timedelta(days=180)
             )
             
             # Create filter dictionary
@@ -501,11 +843,8 @@ def main():
                 'valid_on_date': valid_on_date.isoformat() if valid_on_date else None
             }
             
-            # Load data with filters
-            df = load_data(conn, filters)
-            
-            # Close connection
-            conn.close()
+            # Count the matching offers; rows are only loaded by the views that show them
+            total_offers = dashboard_metrics(today.isoformat(), **filters)[0]
             
         except Exception as e:
             st.error(f"Database error: {e}")
@@ -513,215 +852,31 @@ def main():
             return
     
     # Display data stats
-    st.markdown(f"### Found {len(df)} offers matching your criteria")
-    
-    # Create tabs for different views
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Dashboard", "📋 Data Explorer", "📈 Analytics", "👥 Customers", "💳 Transactions"])
+    st.markdown(f"### Found {total_offers} offers matching your criteria")
     
-    # Tab 1: Dashboard
-    with tab1:
-        # Top metrics row
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric(
-                label="Total Offers", 
-                value=len(df),
-                delta=None
-            )
-        
-        with col2:
-            merchant_count = df['merchant'].nunique()
-            st.metric(
-                label="Unique Merchants", 
-                value=merchant_count,
-                delta=None
-            )
-        
-        with col3:
-            avg_discount = df['discount_percent'].mean()
-            st.metric(
-                label="Avg. Discount", 
-                value=f"{avg_discount:.1f}%" if not pd.isna(avg_discount) else "N/A",
-                delta=None
-            )
-        
-        with col4:
-            # Calculate offers expiring soon (within 7 days)
-            df['valid_until'] = pd.to_datetime(df['valid_until'])
-            expiring_soon = sum(
-                (df['valid_until'] >= datetime.now()) & 
-                (df['valid_until'] <= datetime.now() + timedelta(days=7))
-            )
-            st.metric(
-                label="Expiring Soon", 
-                value=expiring_soon,
-                delta=None
-            )
-        
-        # Charts
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Offers by merchant chart
-            st.plotly_chart(create_offers_by_merchant_chart(df), use_container_width=True)
-            
-            # Offers by category chart
-            st.plotly_chart(create_offers_by_category_chart(df), use_container_width=True)
-        
-        with col2:
-            # Offers by type chart
-            st.plotly_chart(create_offers_by_type_chart(df), use_container_width=True)
-            
-            # Discount distribution chart
-            st.plotly_chart(create_discount_distribution_chart(df), use_container_width=True)
-        
-        # Full width charts
-        st.plotly_chart(create_offers_timeline_chart(df), use_container_width=True)
-    
-    # Tab 2: Data Explorer
-    with tab2:
-        # Display data table with pagination
-        st.dataframe(
-            df.style.highlight_max(subset=['discount_percent'], color='lightgreen')
-              .highlight_min(subset=['discount_percent'], color='#ffcccc'),
-            height=600
-        )
-        
-        # Export functionality
-        st.download_button(
-            label="Download Data as CSV",
-            data=df.to_csv(index=False).encode('utf-8'),
-            file_name="merchant_offers_export.csv",
-            mime="text/csv"
-        )
-        
-        # Offer details section
-        st.subheader("Offer Details")
-        selected_offer_id = st.selectbox("Select an offer to view details", df['offer_id'].tolist())
-        
-        if selected_offer_id:
-            offer_details = df[df['offer_id'] == selected_offer_id].iloc[0]
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown(f"**Merchant:** {offer_details['merchant']}")
-                st.markdown(f"**Category:** {offer_details['category']}")
-                st.markdown(f"**Offer Type:** {offer_details['type']}")
-                
-                if not pd.isna(offer_details['discount_percent']):
-                    st.markdown(f"**Discount:** {offer_details['discount_percent']}%")
-                elif not pd.isna(offer_details['discount_value']):
-                    st.markdown(f"**Discount Value:** ₹{offer_details['discount_value']}")
-                
-                if not pd.isna(offer_details['minimum_purchase']):
-                    st.markdown(f"**Minimum Purchase:** ₹{offer_details['minimum_purchase']}")
-                
-                if not pd.isna(offer_details['coupon_code']):
-                    st.code(offer_details['coupon_code'], language="")
-            
-            with col2:
-                st.markdown(f"**Valid From:** {offer_details['valid_from']}")
-                st.markdown(f"**Valid Until:** {offer_details['valid_until']}")
-                
-                if not pd.isna(offer_details['affiliate_link']):
-                    st.markdown(f"**Affiliate Link:** {offer_details['affiliate_link']}")
-            
-            st.markdown("### Description")
-            st.markdown(offer_details['description'])
-            
-            st.markdown("### Terms and Conditions")
-            st.markdown(offer_details['terms_conditions'])
+    # Only the selected view is rendered; st.tabs would run every tab's code on each rerun
+    view = st.radio("View", VIEWS, horizontal=True, key="active_tab", label_visibility="collapsed")
     
-    # Tab 3: Analytics
-    with tab3:
-        st.subheader("Offers Analytics")
-        
-        # Top merchants by offer count
-        st.markdown("#### Top Merchants by Offer Count")
-        top_merchants = df['merchant'].value_counts().head(10)
-        st.bar_chart(top_merchants)
-        
-        # Offer type distribution over time
-        st.markdown("#### Offer Type Distribution Over Time")
-        
-        # Convert dates and create month column
-        df['valid_from'] = pd.to_datetime(df['valid_from'])
-        df['month'] = df['valid_from'].dt.strftime('%Y-%m')
-        
-        # Group by month and offer type
-        type_time_dist = df.groupby(['month', 'type']).size().unstack().fillna(0)
-        
-        # Only show if we have time-based data
-        if not type_time_dist.empty and len(type_time_dist) > 1:
-            st.line_chart(type_time_dist)
+    if view == "📊 Dashboard":
+        show_dashboard_tab(filters, today.isoformat())
+    elif view == "📋 Data Explorer":
+        show_data_explorer_tab(filters)
+    elif view == "📈 Analytics":
+        show_analytics_tab(filters)
+    elif view == "👥 Customers":
+        if customers_module_available:
+            try:
+                customers.show_customers_tab()
+            except Exception as e:
+                st.error(f"Error displaying customers tab: {e}")
+                st.exception(e)
         else:
-            st.info("Not enough time-based data to show distribution over time")
-        
-        # Discount analysis
-        st.markdown("#### Discount Analysis by Category")
-        
-        # Group by category and calculate average discount
-        discount_by_category = df.groupby('category')['discount_percent'].mean().sort_values(ascending=False)
-        
-        # Show the analysis
-        if not discount_by_category.empty:
-            st.bar_chart(discount_by_category)
-        else:
-            st.info("Not enough discount data available for analysis")
-        
-        # Correlation analysis
-        st.markdown("#### Correlation: Minimum Purchase vs. Discount")
-        
-        # Filter for rows with both values present
-        corr_data = df[['minimum_purchase', 'discount_percent']].dropna()
-        
-        if len(corr_data) > 5:
-            fig = px.scatter(
-                corr_data,
-                x='minimum_purchase',
-                y='discount_percent',
-                title='Correlation between Minimum Purchase and Discount Percentage',
-                labels={
-                    'minimum_purchase': 'Minimum Purchase (₹)',
-                    'discount_percent': 'Discount Percentage (%)'
-                },
-                trendline='ols'
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Calculate correlation coefficient
-            correlation = corr_data.corr().iloc[0, 1]
-            st.markdown(f"**Correlation Coefficient:** {correlation:.2f}")
-            
-            if correlation > 0.5:
-                st.success("Strong positive correlation: Higher minimum purchase amounts tend to offer larger discounts")
-            elif correlation < -0.5:
-                st.success("Strong negative correlation: Lower minimum purchase amounts tend to offer larger discounts")
-            else:
-                st.info("No strong correlation between minimum purchase amount and discount percentage")
+            st.warning("Customers module not available. Please make sure customers.py is in your repository.")
+    elif view == "💳 Transactions":
+        if show_transactions_tab:
+            show_transactions_tab()
         else:
-            st.info("Not enough data points to perform correlation analysis")
-
-        # Customers tab
-        with tab4:
-            if customers_module_available:
-                try:
-                    customers.show_customers_tab()
-                except Exception as e:
-                    st.error(f"Error displaying customers tab: {e}")
-                    st.exception(e)
-            else:
-                st.warning("Customers module not available. Please make sure customers.py is in your repository.")
-
-        # Transactions tab
-        with tab5:
-            if show_transactions_tab:
-                show_transactions_tab()
-            else:
-                st.error("Transaction analysis module not found")
+            st.error("Transaction analysis module not found")
 
 
 if __name__ == "__main__":
@@ -1,15 +1,44 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import numpy as np
 import os
-import random
-import string
+from itertools import chain
+from db_utils import CUSTOMERS_TABLE_SQL, WRITE_LOCK, begin_bulk_load, close_db, db_mtime, end_bulk_load, ensure_customers_indexes, fts_prefix_query, iter_csv, open_db, remove_db
 
 # Customer database path
 CUSTOMERS_DB_PATH = 'data/customer_database.db'
 
+# Sample data for generation, built once as arrays for the vectorized draws
+FIRST_NAMES = np.array(["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+                        "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica"])
+LAST_NAMES = np.array(["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+                       "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson"])
+MOBILE_TYPES = np.array(["iOS", "Android"])
+EMAIL_DOMAINS = np.array(["gmail.com", "yahoo.com", "outlook.com", "icloud.com"])
+
+# One generator for the process, so regenerations continue its stream
+CUSTOMER_RNG = np.random.default_rng()
+
+@st.cache_resource(max_entries=1)
+def get_customers_conn(file_identity):
+    """Open the shared customers connection (WAL, tuned PRAGMAs) for one version of the file"""
+    return open_db(CUSTOMERS_DB_PATH, check_same_thread=False)
+
+def customers_file_identity():
+    """Identity of the customers file, which changes when the file is replaced"""
+    stat = os.stat(CUSTOMERS_DB_PATH)
+    return (stat.st_ino, stat.st_ctime_ns)
+
+def customers_conn():
+    """Shared customers connection, reopened when the file is replaced (e.g. from the admin app)"""
+    return get_customers_conn(customers_file_identity())
+
 def ensure_customer_database():
     """Checks if the customer database exists and has data"""
+    # Already checked in this session for this version of the file
+    if os.path.exists(CUSTOMERS_DB_PATH) and st.session_state.get("customers_db_ready") == customers_file_identity():
+        return True
+    
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
     
@@ -26,25 +55,27 @@ def ensure_customer_database():
     
     # Check if database has data
     try:
-        conn = sqlite3.connect(CUSTOMERS_DB_PATH)
-        cursor = conn.cursor()
+        cursor = customers_conn().cursor()
         
-        # Check if customers table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='customers'")
-        if not cursor.fetchone():
-            st.warning("Customer database structure is invalid.")
+        # Check the customers table exists with the current layout; files from
+        # before the integer key have no id column and must be recreated
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(customers)")}
+        if 'id' not in columns:
+            if columns:
+                st.warning("Customer database uses an outdated structure and needs to be recreated.")
+            else:
+                st.warning("Customer database structure is invalid.")
             if st.button("Recreate Customer Database"):
                 generate_customer_data()
                 st.success("Customer database recreated successfully! Refresh the page to see the data.")
                 return False
             return False
         
-        # Check if table has records
-        cursor.execute("SELECT COUNT(*) FROM customers")
-        count = cursor.fetchone()[0]
-        conn.close()
+        # Check if table has records; EXISTS stops at the first row instead of counting them all
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM customers)")
+        has_records = cursor.fetchone()[0]
         
-        if count == 0:
+        if not has_records:
             st.warning("Customer database is empty.")
             if st.button("Generate Customer Data"):
                 generate_customer_data()
@@ -52,6 +83,7 @@ def ensure_customer_database():
                 return False
             return False
         
+        st.session_state["customers_db_ready"] = customers_file_identity()
         return True
     except Exception as e:
         st.error(f"Error checking customer database: {e}")
@@ -63,132 +95,139 @@ def ensure_customer_database():
 def generate_customer_data():
     """Generates a new customer database with 1000 records"""
     try:
-        # Remove existing database if it exists
-        if os.path.exists(CUSTOMERS_DB_PATH):
-            os.remove(CUSTOMERS_DB_PATH)
-        
-        # Create a new database
-        conn = sqlite3.connect(CUSTOMERS_DB_PATH)
-        cursor = conn.cursor()
-        
-        # Create the table
-        cursor.execute('''
-        CREATE TABLE customers (
-            customer_id TEXT PRIMARY KEY,
-            customer_name TEXT NOT NULL,
-            mobile_number TEXT NOT NULL,
-            email TEXT NOT NULL,
-            mobile_type TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Simple data for generation
-        first_names = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
-                       "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica"]
-        last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
-                      "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson"]
-        mobile_types = ["iOS", "Android"]
-        email_domains = ["gmail.com", "yahoo.com", "outlook.com", "icloud.com"]
-        
-        # Generate customer data
-        customer_data = []
-        for i in range(1000):
-            customer_id = f"CUST{i+1:06d}"
-            first_name = random.choice(first_names)
-            last_name = random.choice(last_names)
-            customer_name = f"{first_name} {last_name}"
-            mobile_number = f"+1{''.join(random.choices(string.digits, k=10))}"
-            email = f"{first_name.lower()}.{last_name.lower()}{random.randint(1,99)}@{random.choice(email_domains)}"
-            mobile_type = random.choice(mobile_types)
+        # Serialize with the other writers (add customer, admin create/reset)
+        with WRITE_LOCK:
+            # Drop the shared connection to the old file, then remove it
+            get_customers_conn.clear()
+            remove_db(CUSTOMERS_DB_PATH)
             
-            customer_data.append((customer_id, customer_name, mobile_number, email, mobile_type))
-        
-        # Insert data in batches
-        batch_size = 100
-        for i in range(0, len(customer_data), batch_size):
-            batch = customer_data[i:i+batch_size]
+            # Create a new database; the file was just removed and a failed run is
+            # simply re-created, so skip the journal and fsyncs for the bulk load
+            conn = open_db(CUSTOMERS_DB_PATH)
+            cursor = conn.cursor()
+            begin_bulk_load(conn)
+            
+            # Create the table
+            cursor.execute(CUSTOMERS_TABLE_SQL)
+            
+            # Generate customer data column-wise with NumPy
+            total_customers = 1000
+            rng = CUSTOMER_RNG
+            firsts = pd.Series(rng.choice(FIRST_NAMES, total_customers))
+            lasts = pd.Series(rng.choice(LAST_NAMES, total_customers))
+            phone_numbers = pd.Series(rng.integers(0, 10**10, total_customers)).astype(str).str.zfill(10)
+            suffixes = pd.Series(rng.integers(1, 100, total_customers)).astype(str)
+            domains = pd.Series(rng.choice(EMAIL_DOMAINS, total_customers))
+            
+            customers_df = pd.DataFrame({
+                "id": np.arange(1, total_customers + 1),
+                "customer_name": firsts + " " + lasts,
+                "mobile_number": "+1" + phone_numbers,
+                "email": firsts.str.lower() + "." + lasts.str.lower() + suffixes + "@" + domains,
+                "mobile_type": rng.choice(MOBILE_TYPES, total_customers)
+            })
+            
+            # Add 3 real customers (keys are outside the generated range)
+            real_customers = [
+                (901001, "John Smith", "+12025550123", "john.smith@example.com", "iOS"),
+                (901002, "Mary Johnson", "+16505551234", "mary.johnson@example.com", "Android"),
+                (901003, "Robert Davis", "+13125552345", "robert.davis@example.com", "iOS")
+            ]
+            
+            # Insert generated and real customers in a single transaction (one fsync)
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.executemany(
-                "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-                batch
+                "INSERT INTO customers (id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
+                chain(customers_df.itertuples(index=False, name=None), real_customers)
             )
             conn.commit()
-        
-        # Add 3 real customers
-        real_customers = [
-            ("CUST901001", "John Smith", "+12025550123", "john.smith@example.com", "iOS"),
-            ("CUST901002", "Mary Johnson", "+16505551234", "mary.johnson@example.com", "Android"),
-            ("CUST901003", "Robert Davis", "+13125552345", "robert.davis@example.com", "iOS")
-        ]
-        
-        for customer in real_customers:
-            try:
-                cursor.execute(
-                    "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-                    customer
-                )
-            except sqlite3.IntegrityError:
-                # If ID exists, try with a different ID
-                pass
-        
-        conn.commit()
-        conn.close()
-        
+            end_bulk_load(conn)
+            close_db(conn)
+            
         return True
     except Exception as e:
         st.error(f"Error generating customer database: {e}")
         return False
 
-def load_customers_data(conn, filters=None):
-    """Load customer data with optional filters"""
-    query = "SELECT * FROM customers"
+# Rows shown per page of the customers table
+CUSTOMERS_PAGE_SIZE = 100
+
+def customers_where(filters=None):
+    """Build the WHERE clause and parameters for the customer filters"""
+    where = ""
     params = []
     
     if filters:
         conditions = []
         
-        if filters.get('customer_name'):
-            conditions.append("customer_name LIKE ?")
-            params.append(f"%{filters['customer_name']}%")
+        # Name search goes through the full-text index (word prefixes) instead of a LIKE scan
+        if filters.get('customer_name') and filters['customer_name'].split():
+            conditions.append("id IN (SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?)")
+            params.append(fts_prefix_query(filters['customer_name']))
         
         if filters.get('mobile_type'):
             conditions.append("mobile_type = ?")
             params.append(filters['mobile_type'])
         
         if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+            where = " WHERE " + " AND ".join(conditions)
     
-    return pd.read_sql_query(query, conn, params=params)
+    return where, params
+
+# Columns shown and exported; the internal key and created_at are left out
+CUSTOMER_COLUMNS = ("customer_id", "customer_name", "mobile_number", "email", "mobile_type")
+
+def customers_query(filters=None, columns=None):
+    """Build the customers SELECT for the given filters and columns"""
+    columns = columns or CUSTOMER_COLUMNS
+    unknown = set(columns) - set(CUSTOMER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown customer columns: {', '.join(sorted(unknown))}")
+    where, params = customers_where(filters)
+    return f"SELECT {', '.join(columns)} FROM customers{where}", params
+
+# The cached queries below take the filters as plain scalars, so the cache keys
+# are cheap to hash; db_mtime keys each entry to the current version of the file
+
+@st.cache_data(max_entries=64)
+def count_customers_by_mobile_type(db_mtime, customer_name=None, mobile_type=None):
+    """Number of matching customers per mobile type, counted in SQL"""
+    where, params = customers_where({'customer_name': customer_name, 'mobile_type': mobile_type})
+    query = f"SELECT mobile_type, COUNT(*) FROM customers{where} GROUP BY mobile_type"
+    return dict(customers_conn().execute(query, params).fetchall())
 
-def get_customers_filter_options(conn):
+@st.cache_data(max_entries=64)
+def load_customers_data(db_mtime, customer_name=None, mobile_type=None, columns=None, limit=None, offset=0):
+    """Load customer data with optional filters, limited to a tuple of columns and one page of rows if given"""
+    query, params = customers_query({'customer_name': customer_name, 'mobile_type': mobile_type}, columns)
+    if limit:
+        query += " ORDER BY id LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    return pd.read_sql_query(query, customers_conn(), params=params)
+
+@st.cache_data(max_entries=16)
+def customers_csv(db_mtime, customer_name=None, mobile_type=None):
+    """Matching customers as UTF-8 CSV bytes, streamed from the cursor in chunks"""
+    query, params = customers_query({'customer_name': customer_name, 'mobile_type': mobile_type})
+    return b"".join(iter_csv(customers_conn().execute(query, params)))
+
+# Shared by reference across reruns; db_mtime keys the entry to the current file
+@st.cache_resource(max_entries=4)
+def get_customers_filter_options(db_mtime):
     """Get available filter options"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT mobile_type FROM customers")
-    mobile_types = [row[0] for row in cursor.fetchall()]
-    return {'mobile_types': mobile_types}
+    rows = customers_conn().execute("SELECT DISTINCT mobile_type FROM customers ORDER BY mobile_type")
+    return {'mobile_types': tuple(row[0] for row in rows)}
 
 def add_real_customer(conn, customer_name, mobile_number, email, mobile_type):
     """Add a real customer to the database"""
-    cursor = conn.cursor()
-    
-    # Generate a new customer_id
-    cursor.execute("SELECT MAX(SUBSTR(customer_id, 5)) FROM customers")
-    max_id_result = cursor.fetchone()[0]
-    
-    if max_id_result is None:
-        max_id = 0
-    else:
-        max_id = int(max_id_result)
-    
-    new_id = max_id + 1
-    customer_id = f"CUST{new_id:06d}"
-    
-    # Insert the new customer
-    cursor.execute(
-        "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-        (customer_id, customer_name, mobile_number, email, mobile_type)
-    )
-    conn.commit()
+    # Insert the new customer in its own transaction; customer_id is generated
+    # from the new integer key and handed back by the INSERT itself
+    with WRITE_LOCK, conn:
+        customer_id, = conn.execute(
+            "INSERT INTO customers (customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?) "
+            "RETURNING customer_id",
+            (customer_name, mobile_number, email, mobile_type)
+        ).fetchone()
     return customer_id
 
 def show_customers_tab():
@@ -201,7 +240,8 @@ def show_customers_tab():
     
     # Connect to the database
     try:
-        conn = sqlite3.connect(CUSTOMERS_DB_PATH)
+        conn = customers_conn()
+        ensure_customers_indexes(conn)
     except Exception as e:
         st.error(f"Error connecting to database: {e}")
         return
@@ -212,15 +252,19 @@ def show_customers_tab():
         
         # Get filter options
         try:
-            filter_options = get_customers_filter_options(conn)
-            
-            # Create filters
-            customer_name_filter = st.text_input("Search by Name")
+            filter_options = get_customers_filter_options(db_mtime(CUSTOMERS_DB_PATH))
             
-            if filter_options['mobile_types']:
-                selected_mobile_type = st.selectbox("Mobile Type", ["All"] + filter_options['mobile_types'])
-            else:
-                selected_mobile_type = "All"
+            # Create filters; inside a form they only rerun the tab when applied,
+            # not on every keystroke in the search box
+            with st.form("customer_filters_form"):
+                customer_name_filter = st.text_input("Search by Name")
+                
+                if filter_options['mobile_types']:
+                    selected_mobile_type = st.selectbox("Mobile Type", ("All",) + filter_options['mobile_types'])
+                else:
+                    selected_mobile_type = "All"
+                
+                st.form_submit_button("Apply Filters")
             
             # Apply filters
             filters = {}
@@ -237,31 +281,37 @@ def show_customers_tab():
     
     # Load and display customer data
     try:
-        customers_df = load_customers_data(conn, filters)
+        # Metrics come from one GROUP BY; only the page on screen is loaded
+        version = db_mtime(CUSTOMERS_DB_PATH)
+        mobile_counts = count_customers_by_mobile_type(version, **filters)
+        total_customers = sum(mobile_counts.values())
         
-        if customers_df.empty:
+        if total_customers == 0:
             st.info("No customers found matching your filters.")
         else:
             # Display summary metrics
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.metric("Total Customers", f"{len(customers_df):,}")
+                st.metric("Total Customers", f"{total_customers:,}")
             
             with col2:
-                ios_users = len(customers_df[customers_df["mobile_type"] == "iOS"])
-                st.metric("iOS Users", f"{ios_users:,}")
+                st.metric("iOS Users", f"{mobile_counts.get('iOS', 0):,}")
             
             with col3:
-                android_users = len(customers_df[customers_df["mobile_type"] == "Android"])
-                st.metric("Android Users", f"{android_users:,}")
+                st.metric("Android Users", f"{mobile_counts.get('Android', 0):,}")
             
-            # Display customer table
+            # Display customer table, one page at a time
             st.subheader("Customer Data")
+            page_count = -(-total_customers // CUSTOMERS_PAGE_SIZE)
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1) if page_count > 1 else 1
+            offset = (page - 1) * CUSTOMERS_PAGE_SIZE
+            customers_df = load_customers_data(version, **filters, limit=CUSTOMERS_PAGE_SIZE, offset=offset)
+            st.caption(f"Showing customers {offset + 1:,}-{offset + len(customers_df):,} of {total_customers:,}")
             st.dataframe(customers_df)
             
             # CSV download button
-            csv = customers_df.to_csv(index=False)
+            csv = customers_csv(version, **filters)
             st.download_button(
                 label="Download Customers as CSV",
                 data=csv,
@@ -304,9 +354,6 @@ def show_customers_tab():
                 st.info("Refresh the page to see the updated customer list.")
             except Exception as e:
                 st.error(f"Error adding customer: {e}")
-    
-    # Close the database connection
-    conn.close()
 
 if __name__ == "__main__":
     st.set_page_config(page_title="Customer Database", layout="wide")
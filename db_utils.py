@@ -0,0 +1,205 @@
+import csv
+import io
+import os
+import sqlite3
+import threading
+
+# Tuning applied to every connection we open. journal_mode=WAL is persisted in
+# the database file, the remaining PRAGMAs only last for the connection.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=30000",
+)
+
+# Serializes writers within the process (WAL allows one writer at a time)
+WRITE_LOCK = threading.Lock()
+
+def apply_pragmas(conn):
+    """Apply the standard PRAGMA tuning to an open connection"""
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def begin_bulk_load(conn):
+    """Turn off journaling while a throwaway database is rebuilt from scratch"""
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA foreign_keys=OFF")
+
+def end_bulk_load(conn):
+    """Restore the normal WAL settings after a bulk load"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+
+def open_db(path, **kwargs):
+    """Open a SQLite connection in WAL mode with tuned PRAGMAs"""
+    conn = sqlite3.connect(path, timeout=30, **kwargs)
+    return apply_pragmas(conn)
+
+def close_db(conn):
+    """Let SQLite refresh planner statistics if needed, then close the connection"""
+    conn.execute("PRAGMA optimize")
+    conn.close()
+
+def db_mtime(path):
+    """Last modification time of a database, including writes still in its WAL file"""
+    wal_path = path + "-wal"
+    mtime = os.path.getmtime(path)
+    return max(mtime, os.path.getmtime(wal_path)) if os.path.exists(wal_path) else mtime
+
+def iter_csv(cursor, chunksize=10_000):
+    """Yield the rows of an executed query as UTF-8 CSV, chunksize rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(column[0] for column in cursor.description)
+    while True:
+        rows = cursor.fetchmany(chunksize)
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        if len(rows) < chunksize:
+            return
+        buffer.seek(0)
+        buffer.truncate()
+
+def remove_db(path):
+    """Delete a database file together with its WAL and shared-memory files"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+# Shared customers schema. customer_id is derived from the integer key, so new
+# customers take their ID from the rowid instead of scanning for the maximum.
+CUSTOMERS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id TEXT GENERATED ALWAYS AS ('CUST' || printf('%06d', id)) STORED UNIQUE,
+    customer_name TEXT NOT NULL,
+    mobile_number TEXT NOT NULL,
+    email TEXT NOT NULL,
+    mobile_type TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+def format_customer_id(customer_key):
+    """Format an integer customer key as a customer_id (e.g. CUST000042)"""
+    return f"CUST{customer_key:06d}"
+
+def is_legacy_customers_table(conn):
+    """Whether conn has a customers table from before the integer id key"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(customers)")}
+    return bool(columns) and 'id' not in columns
+
+# Shared offers schema; offer_id is the key API refreshes upsert on
+OFFER_COLUMNS = (
+    "offer_id", "merchant", "category", "type", "discount_percent", "discount_value",
+    "minimum_purchase", "coupon_code", "description", "terms_conditions",
+    "valid_from", "valid_until", "affiliate_link",
+)
+
+OFFERS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS offers (
+    offer_id TEXT PRIMARY KEY,
+    merchant TEXT,
+    category TEXT,
+    type TEXT,
+    discount_percent REAL,
+    discount_value REAL,
+    minimum_purchase REAL,
+    coupon_code TEXT,
+    description TEXT,
+    terms_conditions TEXT,
+    valid_from TEXT,
+    valid_until TEXT,
+    affiliate_link TEXT
+)
+'''
+
+def ensure_offer_id_key(conn):
+    """Give a keyless offers table (written via to_sql before OFFERS_TABLE_SQL) a unique offer_id"""
+    for row in conn.execute("PRAGMA index_list(offers)").fetchall():
+        if row[2] and [col[2] for col in conn.execute(f'PRAGMA index_info("{row[1]}")')] == ["offer_id"]:
+            return
+    # Keep the last written row of any duplicated offer_id, as an upsert would
+    conn.execute("DELETE FROM offers WHERE rowid NOT IN (SELECT MAX(rowid) FROM offers GROUP BY offer_id)")
+    conn.execute("CREATE UNIQUE INDEX idx_offer_id ON offers (offer_id)")
+
+# Offers indexes. Each filter column leads an index that also carries the date
+# and discount columns, so filtered counts, averages and GROUP BYs are answered
+# from the index without visiting the table.
+OFFERS_INDEXES_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_offers_merchant ON offers (merchant, valid_from, valid_until, discount_percent, discount_value)",
+    "CREATE INDEX IF NOT EXISTS idx_offers_category ON offers (category, valid_from, valid_until, discount_percent, discount_value)",
+    "CREATE INDEX IF NOT EXISTS idx_offers_type ON offers (type, valid_from, valid_until, discount_percent, discount_value)",
+    "CREATE INDEX IF NOT EXISTS idx_valid_dates ON offers (valid_from, valid_until)",
+    # Both discount columns are indexed so the min-discount OR can use them
+    "CREATE INDEX IF NOT EXISTS idx_discount_percent ON offers (discount_percent)",
+    "CREATE INDEX IF NOT EXISTS idx_discount_value ON offers (discount_value)",
+)
+
+# Single-column indexes the covering ones above replace
+LEGACY_OFFERS_INDEXES = ("idx_merchant", "idx_category", "idx_type")
+
+# PRAGMA user_version of an offers database that has the indexes above
+OFFERS_INDEXES_VERSION = 1
+
+def create_offers_indexes(conn):
+    """Create the offers indexes and refresh the planner statistics"""
+    for name in LEGACY_OFFERS_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for statement in OFFERS_INDEXES_SQL:
+        conn.execute(statement)
+    # Without statistics SQLite prefers the narrow single-column indexes
+    conn.execute("ANALYZE offers")
+    conn.execute(f"PRAGMA user_version={OFFERS_INDEXES_VERSION}")
+
+def ensure_offers_indexes(conn):
+    """Bring the offers indexes of an existing database up to date once per file"""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= OFFERS_INDEXES_VERSION:
+        return
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'offers'").fetchone():
+        return
+    with WRITE_LOCK, conn:
+        create_offers_indexes(conn)
+
+# Customers indexes. mobile_type serves the type filter, the per-type counts and
+# the filter options from the index alone. The full-text index over customer
+# names is kept in sync with customers by triggers; it is external-content, so
+# only the inverted index is stored.
+CUSTOMERS_INDEXES_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_customers_mobile_type ON customers(mobile_type)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(customer_name, content='customers', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN
+        INSERT INTO customers_fts(rowid, customer_name) VALUES (new.id, new.customer_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, customer_name) VALUES ('delete', old.id, old.customer_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE OF customer_name ON customers BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, customer_name) VALUES ('delete', old.id, old.customer_name);
+        INSERT INTO customers_fts(rowid, customer_name) VALUES (new.id, new.customer_name);
+    END""",
+    "INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')",
+    "ANALYZE customers",
+)
+
+# PRAGMA user_version of a customers database that has the indexes above
+CUSTOMERS_INDEXES_VERSION = 2
+
+def ensure_customers_indexes(conn):
+    """Create the customers indexes and fill the name index once per database file"""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= CUSTOMERS_INDEXES_VERSION:
+        return
+    with WRITE_LOCK, conn:
+        for statement in CUSTOMERS_INDEXES_SQL:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version={CUSTOMERS_INDEXES_VERSION}")
+
+def fts_prefix_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
@@ -1,9 +1,14 @@
 import sqlite3
 import pandas as pd
 import random
+import re
 import string
 from datetime import datetime
 import os
+from db_utils import CUSTOMERS_TABLE_SQL, format_customer_id, is_legacy_customers_table
+
+# Characters that are dropped from the email prefix
+EMAIL_PREFIX_INVALID = re.compile(r"[^a-z0-9.]")
 
 # Ensure the database directory exists
 os.makedirs('data', exist_ok=True)
@@ -12,17 +17,15 @@ os.makedirs('data', exist_ok=True)
 conn = sqlite3.connect('data/customer_database.db')
 cursor = conn.cursor()
 
+# A customers table from before the integer id key can't take the new rows;
+# an empty one is recreated, a filled one is left for generate_customer_db.py
+legacy_table = is_legacy_customers_table(conn)
+if legacy_table and cursor.execute("SELECT COUNT(*) FROM customers").fetchone()[0] == 0:
+    cursor.execute("DROP TABLE customers")
+    legacy_table = False
+
 # Create the customers table if it doesn't exist
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS customers (
-    customer_id TEXT PRIMARY KEY,
-    customer_name TEXT NOT NULL,
-    mobile_number TEXT NOT NULL,
-    email TEXT NOT NULL,
-    mobile_type TEXT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-''')
+cursor.execute(CUSTOMERS_TABLE_SQL)
 conn.commit()
 
 # Check if data already exists
@@ -31,6 +34,8 @@ count = cursor.fetchone()[0]
 
 if count > 0:
     print(f"Database already contains {count} customer records.")
+    if legacy_table:
+        print("It uses an outdated structure; recreate it with generate_customer_db.py.")
 else:
     # Lists for generating realistic customer data
     first_names = [
@@ -67,10 +72,10 @@ else:
     print("Generating 1000 customer records...")
     customer_data = []
 
+    # Weighted mobile types for all records in one draw (the weights are fixed)
+    mobile_type_draws = random.choices(mobile_types, weights=mobile_type_weights, k=1000)
+
     for i in range(1, 1001):
-        # Generate customer_id
-        customer_id = f"CUST{i:06d}"
-        
         # Generate name
         first_name = random.choice(first_names)
         last_name = random.choice(last_names)
@@ -82,20 +87,20 @@ else:
         
         # Generate email based on name
         email_prefix = f"{first_name.lower()}.{last_name.lower()}"
-        email_prefix = ''.join(c for c in email_prefix if c.isalnum() or c == '.')
+        email_prefix = EMAIL_PREFIX_INVALID.sub('', email_prefix)
         random_number = random.randint(1, 99)
         email_domain = random.choice(email_domains)
         email = f"{email_prefix}{random_number}@{email_domain}"
         
         # Assign mobile type with weighted distribution
-        mobile_type = random.choices(mobile_types, weights=mobile_type_weights, k=1)[0]
+        mobile_type = mobile_type_draws[i - 1]
         
         # Add to the list of customer data
-        customer_data.append((customer_id, customer_name, mobile_number, email, mobile_type))
+        customer_data.append((i, customer_name, mobile_number, email, mobile_type))
 
     # Insert data into the database
     cursor.executemany(
-        "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
+        "INSERT INTO customers (id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
         customer_data
     )
     conn.commit()
@@ -103,19 +108,12 @@ else:
 
 # Function to add a real customer
 def add_real_customer(customer_name, mobile_number, email, mobile_type):
-    # Generate a new customer_id based on current max ID
-    cursor.execute("SELECT MAX(SUBSTR(customer_id, 5)) FROM customers")
-    max_id = cursor.fetchone()[0]
-    if max_id is None:
-        max_id = 0
-    new_id = int(max_id) + 1
-    customer_id = f"CUST{new_id:06d}"
-    
-    # Insert the new customer
+    # Insert the new customer; customer_id is derived from the new integer key
     cursor.execute(
-        "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-        (customer_id, customer_name, mobile_number, email, mobile_type)
+        "INSERT INTO customers (customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?)",
+        (customer_name, mobile_number, email, mobile_type)
     )
+    customer_id = format_customer_id(cursor.lastrowid)
     conn.commit()
     return customer_id
 
@@ -1,8 +1,8 @@
-import sqlite3
 import pandas as pd
-import random
-import string
+import numpy as np
 import os
+from itertools import chain
+from db_utils import CUSTOMERS_TABLE_SQL, close_db, format_customer_id, is_legacy_customers_table, open_db
 from datetime import datetime
 
 # Ensure data directory exists
@@ -10,38 +10,34 @@ os.makedirs('data', exist_ok=True)
 
 print("Creating customer database...")
 
-# Connection to the database
-conn = sqlite3.connect('data/customer_database.db')
+# Connection to the database (WAL and the standard PRAGMA tuning)
+conn = open_db('data/customer_database.db')
 cursor = conn.cursor()
 
+# A customers table from before the integer id key can't take the new rows,
+# so it is dropped and recreated instead of cleared
+legacy_table = is_legacy_customers_table(conn)
+if legacy_table:
+    print("Customer database uses an outdated structure and will be recreated.")
+
 # Create the customers table if it doesn't exist
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS customers (
-    customer_id TEXT PRIMARY KEY,
-    customer_name TEXT NOT NULL,
-    mobile_number TEXT NOT NULL,
-    email TEXT NOT NULL,
-    mobile_type TEXT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-''')
-conn.commit()
+cursor.execute(CUSTOMERS_TABLE_SQL)
 
 # Check if data already exists
 cursor.execute("SELECT COUNT(*) FROM customers")
 count = cursor.fetchone()[0]
 
+# Existing rows are deleted in the same transaction that loads the new ones
+clear_existing = False
 if count > 0:
     print(f"Database already contains {count} customer records.")
     print("Do you want to clear existing data and regenerate? (y/n)")
     response = input()
     if response.lower() == "y":
-        cursor.execute("DELETE FROM customers")
-        conn.commit()
-        print("Existing data cleared.")
+        clear_existing = True
     else:
         print("Keeping existing data. Program will exit.")
-        conn.close()
+        close_db(conn)
         exit()
 
 # Lists for generating realistic customer data
@@ -75,92 +71,67 @@ email_domains = ["gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "icloud
 mobile_types = ["iOS", "Android"]  # Including only iOS and Android as specified
 mobile_type_weights = [0.45, 0.55]  # 45% iOS, 55% Android
 
-# Generate 1000 customer records
+# Generate 1000 customer records column-wise: one NumPy draw per field
 print("Generating 1000 customer records...")
-customer_data = []
-
-for i in range(1, 1001):
-    # Generate customer_id
-    customer_id = f"CUST{i:06d}"
-    
-    # Generate name
-    first_name = random.choice(first_names)
-    last_name = random.choice(last_names)
-    customer_name = f"{first_name} {last_name}"
-    
-    # Generate mobile number (10 digits)
-    mobile_number = "".join(random.choices(string.digits, k=10))
-    mobile_number = f"+1{mobile_number}"  # US format
-    
-    # Generate email based on name
-    email_prefix = f"{first_name.lower()}.{last_name.lower()}"
-    email_prefix = ''.join(c for c in email_prefix if c.isalnum() or c == '.')
-    random_number = random.randint(1, 99)
-    email_domain = random.choice(email_domains)
-    email = f"{email_prefix}{random_number}@{email_domain}"
-    
-    # Assign mobile type with weighted distribution
-    mobile_type = random.choices(mobile_types, weights=mobile_type_weights, k=1)[0]
-    
-    # Add to the list of customer data
-    customer_data.append((customer_id, customer_name, mobile_number, email, mobile_type))
-
-# Insert data into the database
-cursor.executemany(
-    "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-    customer_data
-)
-conn.commit()
-
-# Add 3 real customer examples
-print("Adding 3 real customer examples...")
+total_customers = 1000
+rng = np.random.default_rng()
+
+first = pd.Series(rng.choice(first_names, total_customers))
+last = pd.Series(rng.choice(last_names, total_customers))
+
+# Mobile numbers: 10 random digits in US format
+mobile_numbers = "+1" + pd.Series(rng.integers(0, 10**10, total_customers)).astype(str).str.zfill(10)
+
+# Emails based on name, with a number from 1 to 99 and a random domain
+email_prefix = (first.str.lower() + "." + last.str.lower()).str.replace(r"[^a-z0-9.]", "", regex=True)
+emails = email_prefix + pd.Series(rng.integers(1, 100, total_customers)).astype(str) + "@" + rng.choice(email_domains, total_customers)
+
+customer_data = list(zip(
+    range(1, total_customers + 1),
+    first + " " + last,
+    mobile_numbers,
+    emails,
+    # Mobile type with weighted distribution
+    rng.choice(mobile_types, total_customers, p=mobile_type_weights)
+))
+
+# Add 3 real customer examples; the table is empty (or cleared) when they are
+# loaded, so their keys are allocated right after the generated range
 real_customers = [
-    ("CUST001001", "John Smith", "+12025550123", "john.smith@example.com", "iOS"),
-    ("CUST001002", "Mary Johnson", "+16505551234", "mary.johnson@example.com", "Android"),
-    ("CUST001003", "Robert Davis", "+13125552345", "robert.davis@example.com", "iOS")
+    ("John Smith", "+12025550123", "john.smith@example.com", "iOS"),
+    ("Mary Johnson", "+16505551234", "mary.johnson@example.com", "Android"),
+    ("Robert Davis", "+13125552345", "robert.davis@example.com", "iOS")
 ]
+real_customers = [(total_customers + i, *customer) for i, customer in enumerate(real_customers, 1)]
+
+# Replace any existing customers with the generated and the real ones in a
+# single transaction (one commit)
+with conn:
+    if legacy_table:
+        cursor.execute("DROP TABLE customers")
+        cursor.execute(CUSTOMERS_TABLE_SQL)
+        print("Outdated table recreated.")
+    elif clear_existing:
+        cursor.execute("DELETE FROM customers")
+        print("Existing data cleared.")
+    cursor.executemany(
+        "INSERT INTO customers (id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
+        chain(customer_data, real_customers)
+    )
 
 for customer in real_customers:
-    try:
-        cursor.execute(
-            "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-            customer
-        )
-        print(f"Added real customer: {customer[1]}")
-    except sqlite3.IntegrityError:
-        # If the customer_id already exists, try with a different ID
-        print(f"Customer ID {customer[0]} already exists. Trying with a new ID...")
-        
-        cursor.execute("SELECT MAX(SUBSTR(customer_id, 5)) FROM customers")
-        max_id = cursor.fetchone()[0]
-        new_id = int(max_id) + 1
-        new_customer_id = f"CUST{new_id:06d}"
-        
-        cursor.execute(
-            "INSERT INTO customers (customer_id, customer_name, mobile_number, email, mobile_type) VALUES (?, ?, ?, ?, ?)",
-            (new_customer_id, customer[1], customer[2], customer[3], customer[4])
-        )
-        print(f"Added real customer: {customer[1]} with new ID: {new_customer_id}")
-    except Exception as e:
-        print(f"Error adding customer {customer[1]}: {e}")
-
-conn.commit()
-
-# Verify the data
-cursor.execute("SELECT COUNT(*) FROM customers")
-total_count = cursor.fetchone()[0]
-
-cursor.execute("SELECT COUNT(*) FROM customers WHERE mobile_type = 'iOS'")
-ios_count = cursor.fetchone()[0]
+    print(f"Added real customer: {customer[1]} with ID: {format_customer_id(customer[0])}")
 
-cursor.execute("SELECT COUNT(*) FROM customers WHERE mobile_type = 'Android'")
-android_count = cursor.fetchone()[0]
+# Verify the data; one pass counts every mobile type
+cursor.execute("SELECT mobile_type, COUNT(*) FROM customers GROUP BY mobile_type")
+mobile_counts = dict(cursor.fetchall())
+total_count = sum(mobile_counts.values())
 
 print(f"Customer database created successfully with {total_count} total records.")
-print(f"iOS Users: {ios_count}")
-print(f"Android Users: {android_count}")
+print(f"iOS Users: {mobile_counts.get('iOS', 0)}")
+print(f"Android Users: {mobile_counts.get('Android', 0)}")
 
 # Close the connection
-conn.close()
+close_db(conn)
 
 print("Customer database generation complete!")
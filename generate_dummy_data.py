@@ -1,9 +1,6 @@
-import sqlite3
-import pandas as pd
-import random
+import numpy as np
 import datetime
-import uuid
-from tqdm import tqdm
+from db_utils import OFFER_COLUMNS, OFFERS_TABLE_SQL, close_db, create_offers_indexes, open_db
 
 # Define constants for data generation
 NUM_OFFERS = 10000  # Total number of offers to generate
@@ -22,6 +19,10 @@ MERCHANTS = {
     "Pharmacy": ["Pharmeasy", "1mg", "Netmeds", "Apollo Pharmacy", "MedPlus", "Wellness Forever", "Practo", "Healthkart", "Tata 1mg", "Zeno Health"]
 }
 
+# Per-merchant pieces of the generated ids and links, computed once
+MERCHANT_SLUGS = {merchant: merchant.lower().replace(" ", "-").replace("'", "") for merchants in MERCHANTS.values() for merchant in merchants}
+MERCHANT_PREFIXES = {merchant: merchant[:3].upper() for merchants in MERCHANTS.values() for merchant in merchants}
+
 OFFER_TYPES = [
     "discount", "cashback", "buy_one_get_one", "reward_points", 
     "free_delivery", "flash_sale", "bundle_offer", "first_purchase", 
@@ -33,26 +34,46 @@ COUPON_PREFIXES = [
     "DEAL", "SALE", "HURRY", "EXTRA", "SUPER", "HAPPY", "SPECIAL", "WOW"
 ]
 
-def generate_coupon_code():
+# The text helpers below draw their per-offer randomness from a batched stream
+# of uniforms; each generate_dummy_data() call makes its own stream, since a
+# generator can't be advanced from two threads (e.g. two Streamlit sessions)
+def batched(draw, size=4096, **kwargs):
+    """Yield values from draw one at a time, drawing size of them per call"""
+    while True:
+        yield from draw(size=size, **kwargs).tolist()
+
+def uniform(uniforms):
+    """Next uniform value in [0, 1)"""
+    return next(uniforms)
+
+def pick(uniforms, values):
+    """Random element of a sequence"""
+    return values[int(next(uniforms) * len(values))]
+
+def randint(uniforms, low, high):
+    """Random integer in [low, high], both ends included"""
+    return low + int(next(uniforms) * (high - low + 1))
+
+def generate_coupon_code(uniforms):
     """Generate realistic coupon codes"""
-    prefix = random.choice(COUPON_PREFIXES)
-    if random.random() < 0.3:  # 30% chance of merchant-specific coupon
-        merchant_word = random.choice(["SHOP", "APP", "FIRST", "NEW", "FRESH", "BIG"])
-        number = random.randint(10, 50) * 5  # Values like 50, 100, 150, etc.
+    prefix = pick(uniforms, COUPON_PREFIXES)
+    if uniform(uniforms) < 0.3:  # 30% chance of merchant-specific coupon
+        merchant_word = pick(uniforms, ["SHOP", "APP", "FIRST", "NEW", "FRESH", "BIG"])
+        number = randint(uniforms, 10, 50) * 5  # Values like 50, 100, 150, etc.
         return f"{prefix}{merchant_word}{number}"
-    elif random.random() < 0.7:  # 40% chance of discount-indicating coupon
-        if random.random() < 0.5:
-            discount = random.choice([10, 15, 20, 25, 30, 40, 50])
+    elif uniform(uniforms) < 0.7:  # 40% chance of discount-indicating coupon
+        if uniform(uniforms) < 0.5:
+            discount = pick(uniforms, [10, 15, 20, 25, 30, 40, 50])
             return f"{prefix}{discount}"
         else:
-            discount = random.choice([10, 15, 20, 25, 30, 40, 50])
+            discount = pick(uniforms, [10, 15, 20, 25, 30, 40, 50])
             return f"{prefix}{discount}OFF"
     else:  # 30% chance of season or event-based coupon
-        season = random.choice(["SUMMER", "WINTER", "DIWALI", "HOLI", "FEST", "SALE", "SPECIAL"])
-        year = random.choice([2023, 2024, 2025])
+        season = pick(uniforms, ["SUMMER", "WINTER", "DIWALI", "HOLI", "FEST", "SALE", "SPECIAL"])
+        year = pick(uniforms, [2023, 2024, 2025])
         return f"{season}{year}"
 
-def generate_description(merchant, offer_type, discount_percent=None, discount_value=None, 
+def generate_description(uniforms, merchant, offer_type, discount_percent=None, discount_value=None, 
                         min_purchase=None, product_category=None):
     """Generate realistic offer descriptions based on parameters"""
     
@@ -69,15 +90,15 @@ def generate_description(merchant, offer_type, discount_percent=None, discount_v
         return f"Buy 1 Get 1 Free on select {product_category} at {merchant}"
     
     elif offer_type == "reward_points":
-        points = random.randint(2, 10)
+        points = randint(uniforms, 2, 10)
         return f"Earn {points}X reward points on your {merchant} purchase"
     
     elif offer_type == "free_delivery":
         return f"Free delivery on all orders" + (f" above ₹{min_purchase}" if min_purchase else "") + f" at {merchant}"
     
     elif offer_type == "flash_sale":
-        hours = random.randint(2, 12)
-        return f"{hours} Hour Flash Sale! Up to {random.randint(30, 80)}% off on {product_category} at {merchant}"
+        hours = randint(uniforms, 2, 12)
+        return f"{hours} Hour Flash Sale! Up to {randint(uniforms, 30, 80)}% off on {product_category} at {merchant}"
     
     elif offer_type == "bundle_offer":
         return f"Special bundle offer on {product_category} at {merchant}. Buy more save more!"
@@ -92,19 +113,19 @@ def generate_description(merchant, offer_type, discount_percent=None, discount_v
         return f"Limited time offer! Save big on {product_category} at {merchant}"
     
     elif offer_type == "clearance_sale":
-        return f"Clearance Sale! Up to {random.randint(40, 90)}% off on {product_category} at {merchant}"
+        return f"Clearance Sale! Up to {randint(uniforms, 40, 90)}% off on {product_category} at {merchant}"
     
     return f"Special offer at {merchant}"
 
-def generate_terms_conditions(offer_type, min_purchase=None, valid_until=None):
-    """Generate realistic terms and conditions"""
+def generate_terms_conditions(uniforms, offer_type, min_purchase=None, valid_until=None):
+    """Generate realistic terms and conditions; valid_until is the end date as display text"""
     terms = []
     
     # Common terms
     terms.append("Offer cannot be combined with any other offer or promotion.")
     
     if valid_until:
-        terms.append(f"Valid until {valid_until.strftime('%d %b %Y')}.")
+        terms.append(f"Valid until {valid_until}.")
     
     if min_purchase:
         terms.append(f"Minimum purchase of ₹{min_purchase} required.")
@@ -112,19 +133,19 @@ def generate_terms_conditions(offer_type, min_purchase=None, valid_until=None):
     # Offer-specific terms
     if offer_type == "discount":
         terms.append("Discount applicable on selected items only.")
-        if random.random() < 0.3:
+        if uniform(uniforms) < 0.3:
             terms.append("Maximum discount of ₹2000 per order.")
     
     elif offer_type == "cashback":
-        terms.append(f"Cashback will be credited within {random.randint(1, 7)} days of purchase.")
-        terms.append(f"Maximum cashback of ₹{random.choice([500, 1000, 1500, 2000])} per transaction.")
+        terms.append(f"Cashback will be credited within {randint(uniforms, 1, 7)} days of purchase.")
+        terms.append(f"Maximum cashback of ₹{pick(uniforms, [500, 1000, 1500, 2000])} per transaction.")
     
     elif offer_type == "buy_one_get_one":
         terms.append("Offer valid on selected items only.")
         terms.append("Free item must be of equal or lesser value than the purchased item.")
     
     elif offer_type == "reward_points":
-        terms.append(f"Points validity: {random.randint(30, 90)} days from date of credit.")
+        terms.append(f"Points validity: {randint(uniforms, 30, 90)} days from date of credit.")
         terms.append("Points cannot be transferred or exchanged for cash.")
     
     elif offer_type == "free_delivery":
@@ -132,164 +153,140 @@ def generate_terms_conditions(offer_type, min_purchase=None, valid_until=None):
         terms.append("Not applicable for express or same-day delivery.")
     
     # Add some randomized specific terms
-    if random.random() < 0.3:
+    if uniform(uniforms) < 0.3:
         terms.append("Not valid on already discounted items.")
     
-    if random.random() < 0.2:
+    if uniform(uniforms) < 0.2:
         terms.append("Limited to one use per customer.")
     
-    if random.random() < 0.15:
+    if uniform(uniforms) < 0.15:
         terms.append("Valid for online purchases only.")
     
     return "\n".join(terms)
 
 def generate_affiliate_link(merchant, offer_id):
     """Generate dummy affiliate links"""
-    merchant_slug = merchant.lower().replace(" ", "-").replace("'", "")
-    return f"https://{merchant_slug}.affiliate.com/offers/{offer_id}"
+    return f"https://{MERCHANT_SLUGS[merchant]}.affiliate.com/offers/{offer_id}"
 
 def generate_dummy_data():
-    """Generate a dataframe with dummy offer data"""
+    """Generate dummy offers as rows in OFFER_COLUMNS order"""
     print("Generating dummy offers data...")
-    data = []
+    rng = np.random.default_rng()
+    uniforms = batched(rng.random)
+    n = NUM_OFFERS
     
     today = datetime.datetime.now().date()
     
-    for _ in tqdm(range(NUM_OFFERS)):
-        # Select a random category and merchant
-        category = random.choice(list(MERCHANTS.keys()))
-        merchant = random.choice(MERCHANTS[category])
-        
-        # Generate random dates
-        days_to_add = random.randint(-15, 90)  # Some offers started in the past, some in future
-        valid_from = today + datetime.timedelta(days=max(-30, days_to_add - random.randint(5, 30)))
-        valid_until = today + datetime.timedelta(days=days_to_add + random.randint(15, 120))
-        
-        # Generate offer ID
-        offer_id = str(uuid.uuid4())[:8].upper()
-        
-        # Select offer type
-        offer_type = random.choice(OFFER_TYPES)
-        
-        # Generate appropriate values based on offer type
-        discount_percent = None
-        discount_value = None
-        min_purchase = None
-        
-        if offer_type in ["discount", "flash_sale", "clearance_sale"]:
-            discount_percent = random.choice([10, 15, 20, 25, 30, 40, 50, 60, 70])
-            if random.random() < 0.7:  # 70% chance of having minimum purchase
-                min_purchase = random.choice([499, 999, 1499, 1999, 2499, 2999, 4999])
-        
-        elif offer_type == "cashback":
-            if random.random() < 0.6:  # 60% chance of percentage cashback
-                discount_percent = random.choice([5, 10, 15, 20, 25])
-            else:  # 40% chance of fixed cashback
-                discount_value = random.choice([50, 100, 150, 200, 250, 300, 500])
-            min_purchase = random.choice([499, 999, 1499, 1999, 2499])
-        
-        elif offer_type in ["free_delivery", "first_purchase"]:
-            if random.random() < 0.8:  # 80% chance of having minimum purchase
-                min_purchase = random.choice([299, 499, 699, 999, 1499])
-            if offer_type == "first_purchase":
-                if random.random() < 0.5:
-                    discount_percent = random.choice([10, 15, 20, 25, 30])
-                else:
-                    discount_value = random.choice([100, 150, 200, 250, 300])
-        
-        elif offer_type == "buy_one_get_one":
-            # These typically don't have discount percent/value as they're special offers
-            pass
-        
-        elif offer_type == "reward_points":
-            # Usually these offer multipliers on standard points
-            pass
-        
-        elif offer_type == "bundle_offer":
-            if random.random() < 0.6:
-                discount_percent = random.choice([5, 10, 15, 20, 25, 30])
-            min_purchase = random.choice([999, 1499, 1999, 2499, 2999])
-        
-        # Generate coupon code (only some offers have codes)
-        coupon_code = None
-        if random.random() < 0.7:  # 70% chance of having a coupon code
-            coupon_code = generate_coupon_code()
-        
-        # Generate description and terms
-        description = generate_description(
-            merchant, 
-            offer_type, 
-            discount_percent, 
-            discount_value, 
-            min_purchase, 
-            category
-        )
-        
-        terms_conditions = generate_terms_conditions(
-            offer_type, 
-            min_purchase, 
-            valid_until
-        )
-        
-        # Generate affiliate link
-        affiliate_link = generate_affiliate_link(merchant, offer_id)
-        
-        # Create offer record
-        offer = {
-            "offer_id": f"{merchant[:3].upper()}{offer_id}",
-            "merchant": merchant,
-            "category": category,
-            "type": offer_type,
-            "discount_percent": discount_percent,
-            "discount_value": discount_value,
-            "minimum_purchase": min_purchase,
-            "coupon_code": coupon_code,
-            "description": description,
-            "terms_conditions": terms_conditions,
-            "valid_from": valid_from,
-            "valid_until": valid_until,
-            "affiliate_link": affiliate_link
-        }
-        
-        data.append(offer)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-    print(f"Successfully generated {len(df)} offers")
-    return df
+    # Every numeric field is drawn for all offers at once, one column at a time
+    
+    # Select a random category and merchant
+    categories = list(MERCHANTS.keys())
+    category_idx = rng.integers(0, len(categories), size=n)
+    merchant_counts = np.array([len(MERCHANTS[category]) for category in categories])
+    merchant_idx = (rng.random(n) * merchant_counts[category_idx]).astype(int)
+    category = np.array(categories)[category_idx]
+    merchant = [MERCHANTS[c][m] for c, m in zip(category, merchant_idx)]
+    
+    # Generate random date offsets; some offers started in the past, some in future
+    days_to_add = rng.integers(-15, 91, size=n)
+    from_offset = np.maximum(-30, days_to_add - rng.integers(5, 31, size=n))
+    until_offset = days_to_add + rng.integers(15, 121, size=n)
+    
+    # Select offer type
+    offer_type = np.array(OFFER_TYPES)[rng.integers(0, len(OFFER_TYPES), size=n)]
+    
+    # Generate appropriate values based on offer type; 0 marks a missing value
+    discount_percent = np.zeros(n, dtype=int)
+    discount_value = np.zeros(n, dtype=int)
+    min_purchase = np.zeros(n, dtype=int)
+    
+    def assign(target, mask, values):
+        """Fill target where mask is set with random picks from values"""
+        target[mask] = rng.choice(values, mask.sum())
+    
+    discount_like = np.isin(offer_type, ["discount", "flash_sale", "clearance_sale"])
+    assign(discount_percent, discount_like, [10, 15, 20, 25, 30, 40, 50, 60, 70])
+    assign(min_purchase, discount_like & (rng.random(n) < 0.7), [499, 999, 1499, 1999, 2499, 2999, 4999])  # 70% have a minimum purchase
+    
+    cashback = offer_type == "cashback"
+    percent_cashback = rng.random(n) < 0.6  # 60% percentage cashback, 40% fixed cashback
+    assign(discount_percent, cashback & percent_cashback, [5, 10, 15, 20, 25])
+    assign(discount_value, cashback & ~percent_cashback, [50, 100, 150, 200, 250, 300, 500])
+    assign(min_purchase, cashback, [499, 999, 1499, 1999, 2499])
+    
+    delivery_like = np.isin(offer_type, ["free_delivery", "first_purchase"])
+    assign(min_purchase, delivery_like & (rng.random(n) < 0.8), [299, 499, 699, 999, 1499])  # 80% have a minimum purchase
+    first_purchase = offer_type == "first_purchase"
+    percent_off = rng.random(n) < 0.5
+    assign(discount_percent, first_purchase & percent_off, [10, 15, 20, 25, 30])
+    assign(discount_value, first_purchase & ~percent_off, [100, 150, 200, 250, 300])
+    
+    # buy_one_get_one and reward_points carry no discount percent/value
+    
+    bundle = offer_type == "bundle_offer"
+    assign(discount_percent, bundle & (rng.random(n) < 0.6), [5, 10, 15, 20, 25, 30])
+    assign(min_purchase, bundle, [999, 1499, 1999, 2499, 2999])
+    
+    # Only some offers have coupon codes (70%)
+    has_coupon = rng.random(n) < 0.7
+    
+    # Validity dates as ISO strings, from datetime64 arithmetic on the offsets;
+    # the "Valid until" label is formatted once per distinct end date
+    today_day = np.datetime64(today, 'D')
+    valid_from = np.datetime_as_string(today_day + from_offset.astype('timedelta64[D]'), unit='D').tolist()
+    until_days = today_day + until_offset.astype('timedelta64[D]')
+    valid_until = np.datetime_as_string(until_days, unit='D').tolist()
+    distinct_days, day_idx = np.unique(until_days, return_inverse=True)
+    until_labels = np.array([day.strftime('%d %b %Y') for day in distinct_days.tolist()])[day_idx].tolist()
+    
+    # Offer ID suffixes: distinct random 8-digit hex numbers, drawn in one go
+    hex_ids = [f"{value:08X}" for value in rng.choice(16**8, n, replace=False).tolist()]
+    
+    def optional(values):
+        """Amounts as Python numbers, with None where the value is missing"""
+        return [value or None for value in values.tolist()]
+    
+    # The columns become plain lists once, so the row loop below works on
+    # Python objects instead of boxing NumPy scalars element by element
+    category, offer_type = category.tolist(), offer_type.tolist()
+    discount_percent, discount_value, min_purchase = optional(discount_percent), optional(discount_value), optional(min_purchase)
+    
+    # The text fields are still assembled offer by offer
+    offer_ids, coupon_codes, descriptions, terms, links = [], [], [], [], []
+    rows = zip(hex_ids, merchant, category, offer_type, discount_percent, discount_value, min_purchase, has_coupon.tolist(), until_labels)
+    for offer_id, merchant_name, category_name, kind, percent, value, minimum, coupon, until_label in rows:
+        offer_ids.append(f"{MERCHANT_PREFIXES[merchant_name]}{offer_id}")
+        coupon_codes.append(generate_coupon_code(uniforms) if coupon else None)
+        descriptions.append(generate_description(uniforms, merchant_name, kind, percent, value, minimum, category_name))
+        terms.append(generate_terms_conditions(uniforms, kind, minimum, until_label))
+        links.append(generate_affiliate_link(merchant_name, offer_id))
+    
+    # Rows in OFFER_COLUMNS order, ready for executemany
+    offers = list(zip(
+        offer_ids, merchant, category, offer_type,
+        discount_percent, discount_value, min_purchase,
+        coupon_codes, descriptions, terms, valid_from, valid_until, links
+    ))
+    print(f"Successfully generated {len(offers)} offers")
+    return offers
 
-def create_database(df, db_path="offers_database.db"):
-    """Create SQLite database and store the data"""
+def create_database(offers, db_path="offers_database.db"):
+    """Create SQLite database and store the offer rows"""
     print(f"Creating database at {db_path}...")
-    conn = sqlite3.connect(db_path)
-    
-    # Create tables
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS offers (
-        offer_id TEXT PRIMARY KEY,
-        merchant TEXT,
-        category TEXT,
-        type TEXT,
-        discount_percent REAL,
-        discount_value REAL,
-        minimum_purchase REAL,
-        coupon_code TEXT,
-        description TEXT,
-        terms_conditions TEXT,
-        valid_from TEXT,
-        valid_until TEXT,
-        affiliate_link TEXT
+    conn = open_db(db_path)
+    
+    # Replace the offers table and insert all rows in one transaction
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("DROP TABLE IF EXISTS offers")
+    conn.execute(OFFERS_TABLE_SQL)
+    conn.executemany(
+        f"INSERT INTO offers ({', '.join(OFFER_COLUMNS)}) VALUES ({', '.join('?' * len(OFFER_COLUMNS))})",
+        offers
     )
-    ''')
-    
-    # Insert data
-    df.to_sql('offers', conn, if_exists='replace', index=False)
     
-    # Create indices for faster filtering
-    conn.execute('CREATE INDEX IF NOT EXISTS idx_merchant ON offers (merchant)')
-    conn.execute('CREATE INDEX IF NOT EXISTS idx_category ON offers (category)')
-    conn.execute('CREATE INDEX IF NOT EXISTS idx_type ON offers (type)')
-    conn.execute('CREATE INDEX IF NOT EXISTS idx_valid_dates ON offers (valid_from, valid_until)')
+    # Create indices for faster filtering once the rows are in
+    create_offers_indexes(conn)
+    conn.commit()
     
     # Verify data
     cursor = conn.cursor()
@@ -308,17 +305,17 @@ def create_database(df, db_path="offers_database.db"):
     for row in sample:
         print(row)
     
-    conn.close()
+    close_db(conn)
     print(f"Database successfully created at {db_path}")
 
 def main():
     """Main function to generate data and create database"""
     try:
         # Generate dummy data
-        df = generate_dummy_data()
+        offers = generate_dummy_data()
         
         # Create database
-        create_database(df)
+        create_database(offers)
         
         print("\nDummy database created successfully!")
         print("You can now run the dashboard app to visualize and filter this data.")
@@ -1,9 +1,9 @@
 import pandas as pd
+import numpy as np
 import random
 import datetime
 import uuid
 from faker import Faker
-import csv
 
 # Initialize faker
 fake = Faker()
@@ -50,16 +50,30 @@ def generate_customer_name(customer_id):
     random.seed(int(customer_id.replace('CUST', '')))
     return fake.name()
 
+# Amount range (low, high) per category; anything else is 10-100
+AMOUNT_RANGES = {
+    '5411': (15, 200),  # Grocery
+    '5311': (15, 200),  # Department Stores
+    '5542': (20, 60),  # Gas
+    '5812': (25, 150),  # Restaurants
+    '5814': (5, 30),  # Fast Food
+    '7832': (10, 50),  # Movies
+    '5732': (50, 1000),  # Electronics
+    '4899': (50, 200),  # Cable/Internet
+}
+
 def generate_transactions():
-    transactions = []
-    customer_count = 0
-    transaction_count = 0
+    rng = np.random.default_rng()
+    categories = list(MCC_CODES.keys())
+    category_pos = {category: pos for pos, category in enumerate(categories)}
+    customers = []
+    favorites = np.zeros((NUM_CUSTOMERS, 5), dtype=int)
+    favorite_counts = np.zeros(NUM_CUSTOMERS, dtype=int)
     
-    # For each customer
+    # For each customer: name, card and favorite categories
     for i in range(1, NUM_CUSTOMERS + 1):
         customer_id = f"CUST{i:06d}"
         customer_name = generate_customer_name(customer_id)
-        customer_count += 1
         
         # Assign a card type
         card_type = random.choice(CARD_TYPES)
@@ -75,88 +89,67 @@ def generate_transactions():
             card_number = f"6{''.join([str(random.randint(0, 9)) for _ in range(3)])} XXXX XXXX {''.join([str(random.randint(0, 9)) for _ in range(4)])}"
         
         # Create favorite categories for this customer (3-5 categories)
-        favorite_categories = random.sample(list(MCC_CODES.keys()), random.randint(3, 5))
+        favorite_categories = random.sample(categories, random.randint(3, 5))
+        favorites[i - 1, :len(favorite_categories)] = [category_pos[category] for category in favorite_categories]
+        favorite_counts[i - 1] = len(favorite_categories)
         
-        # Generate 1-5 transactions per day with higher probability for favorite categories
-        days = (END_DATE - START_DATE).days
-        for day in range(days):
-            # Not every day has transactions
-            if random.random() > 0.3:  # 30% chance of transactions on any given day
-                continue
-                
-            current_date = START_DATE + datetime.timedelta(days=day)
-            
-            # Generate 1-5 transactions per day
-            num_transactions = random.randint(1, 5)
-            for _ in range(num_transactions):
-                # Select category with preference for favorites
-                if random.random() < 0.7:  # 70% chance of using a favorite category
-                    category = random.choice(favorite_categories)
-                else:
-                    category = random.choice(list(MCC_CODES.keys()))
-                
-                # Select merchant
-                merchant = random.choice(MERCHANTS[category])
-                
-                # Generate amount based on category
-                if category in ['5411', '5311']:  # Grocery, Department Stores
-                    amount = round(random.uniform(15, 200), 2)
-                elif category == '5542':  # Gas
-                    amount = round(random.uniform(20, 60), 2)
-                elif category in ['5812']:  # Restaurants
-                    amount = round(random.uniform(25, 150), 2)
-                elif category in ['5814']:  # Fast Food
-                    amount = round(random.uniform(5, 30), 2)
-                elif category in ['7832']:  # Movies
-                    amount = round(random.uniform(10, 50), 2)
-                elif category in ['5732']:  # Electronics
-                    amount = round(random.uniform(50, 1000), 2)
-                elif category in ['4899']:  # Cable/Internet
-                    amount = round(random.uniform(50, 200), 2)
-                else:
-                    amount = round(random.uniform(10, 100), 2)
-                
-                # Generate transaction time
-                hour = random.randint(8, 21)
-                minute = random.randint(0, 59)
-                second = random.randint(0, 59)
-                transaction_time = f"{hour:02d}:{minute:02d}:{second:02d}"
-                
-                # Generate transaction ID
-                transaction_id = str(uuid.uuid4())
-                
-                # Create transaction record
-                transaction = {
-                    'transaction_id': transaction_id,
-                    'customer_id': customer_id,
-                    'customer_name': customer_name,
-                    'transaction_date': current_date.strftime("%Y-%m-%d"),
-                    'transaction_time': transaction_time,
-                    'merchant_name': merchant,
-                    'merchant_category_code': category,
-                    'transaction_amount': amount,
-                    'card_type': card_type,
-                    'card_number': card_number,
-                    'transaction_type': 'Sale',
-                    'transaction_status': 'Approved'
-                }
-                
-                transactions.append(transaction)
-                transaction_count += 1
+        customers.append((customer_id, customer_name, card_type, card_number))
+    
+    customers = pd.DataFrame(customers, columns=['customer_id', 'customer_name', 'card_type', 'card_number'])
+    
+    # Transactions are built for all customers at once from the customer x day
+    # grid: 30% of days have 1-5 transactions
+    days = (END_DATE - START_DATE).days
+    customer_idx, day_idx = np.nonzero(rng.random((NUM_CUSTOMERS, days)) < 0.3)
+    per_day = rng.integers(1, 6, size=len(customer_idx))
+    customer_idx = np.repeat(customer_idx, per_day)
+    day_idx = np.repeat(day_idx, per_day)
+    n = len(customer_idx)
+    
+    # Select category with preference for favorites (70%)
+    favorite_pick = favorites[customer_idx, (rng.random(n) * favorite_counts[customer_idx]).astype(int)]
+    category_idx = np.where(rng.random(n) < 0.7, favorite_pick, rng.integers(0, len(categories), size=n))
+    
+    # Select merchant from the category's list
+    merchant_lists = [MERCHANTS[category] for category in categories]
+    merchant_counts = np.array([len(merchants) for merchants in merchant_lists])
+    merchant_table = np.array([merchants + [''] * (merchant_counts.max() - len(merchants)) for merchants in merchant_lists], dtype=object)
+    merchant_idx = (rng.random(n) * merchant_counts[category_idx]).astype(int)
     
-    print(f"Generated {transaction_count} transactions for {customer_count} customers")
+    # Generate amount based on category
+    low, high = np.array([AMOUNT_RANGES.get(category, (10, 100)) for category in categories]).T
+    amounts = np.round(rng.uniform(low[category_idx], high[category_idx]), 2)
+    
+    # Generate transaction time
+    times = pd.Series(rng.integers(8, 22, size=n) * 3600 + rng.integers(0, 3600, size=n))
+    transaction_times = pd.to_datetime(times, unit='s').dt.strftime("%H:%M:%S")
+    
+    dates = np.array([(START_DATE + datetime.timedelta(days=day)).strftime("%Y-%m-%d") for day in range(days)])
+    
+    transactions = pd.DataFrame({
+        'transaction_id': [str(uuid.uuid4()) for _ in range(n)],
+        'customer_id': customers['customer_id'].values[customer_idx],
+        'customer_name': customers['customer_name'].values[customer_idx],
+        'transaction_date': dates[day_idx],
+        'transaction_time': transaction_times.values,
+        'merchant_name': merchant_table[category_idx, merchant_idx],
+        'merchant_category_code': np.array(categories)[category_idx],
+        'transaction_amount': amounts,
+        'card_type': customers['card_type'].values[customer_idx],
+        'card_number': customers['card_number'].values[customer_idx],
+        'transaction_type': 'Sale',
+        'transaction_status': 'Approved'
+    })
+    
+    print(f"Generated {n} transactions for {NUM_CUSTOMERS} customers")
     return transactions
 
 def save_to_csv(transactions, filename):
-    with open(filename, 'w', newline='') as csvfile:
-        if not transactions:
-            print("No transactions to save")
-            return
-            
-        fieldnames = transactions[0].keys()
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(transactions)
+    if transactions.empty:
+        print("No transactions to save")
+        return
+    
+    transactions.to_csv(filename, index=False)
     
     print(f"Saved {len(transactions)} transactions to {filename}")
 
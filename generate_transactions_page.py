@@ -39,18 +39,19 @@ if st.button("Generate Transaction History"):
             file_path = 'customer_transaction_history.csv'
             
             if os.path.exists(file_path):
-                # Read the file
-                df = pd.read_csv(file_path)
+                # Read only what the summary and preview need
+                customer_ids = pd.read_csv(file_path, usecols=['customer_id'])['customer_id']
                 
                 # Show success message
-                st.success(f"Generated {len(df)} transactions for {df['customer_id'].nunique()} customers!")
+                st.success(f"Generated {len(customer_ids)} transactions for {customer_ids.nunique()} customers!")
                 
                 # Show preview
                 st.write("Preview of generated data:")
-                st.dataframe(df.head())
+                st.dataframe(pd.read_csv(file_path, nrows=5))
                 
-                # Create download button
-                csv = df.to_csv(index=False)
+                # Create download button; the file on disk already is the CSV
+                with open(file_path, 'rb') as csv_file:
+                    csv = csv_file.read()
                 st.download_button(
                     label="Download CSV",
                     data=csv,
@@ -0,0 +1,5 @@
+import streamlit as st
+
+# Fragments rerun on their own widget changes only; st.fragment is Streamlit >= 1.37
+# (experimental_fragment from 1.33), older versions just run the function inline
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
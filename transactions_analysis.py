@@ -76,19 +76,18 @@ def show_transactions_tab():
         # Select customer for analysis
         # Customer selector - handle case when customer_name is not available
         if 'customer_name' in transactions_df.columns:
-            # Create list of (id, name) tuples
-            customer_list = []
-            for cid in transactions_df['customer_id'].unique():
-                name = transactions_df[transactions_df['customer_id'] == cid]['customer_name'].iloc[0]
-                customer_list.append((cid, name))
-            
-            # Sort by name
-            customer_list = sorted(customer_list, key=lambda x: x[1])
+            # First name seen for each customer in one pass, sorted by name
+            customer_names = (
+                transactions_df.drop_duplicates('customer_id')
+                .set_index('customer_id')['customer_name']
+                .sort_values(kind='stable')
+            )
+            names_by_id = customer_names.to_dict()
             
             selected_customer = st.selectbox(
                 "Select Customer",
-                options=[id for id, _ in customer_list],
-                format_func=lambda id: next((name for cid, name in customer_list if cid == id), id)
+                options=customer_names.index.tolist(),
+                format_func=lambda id: names_by_id.get(id, id)
             )
         else:
             # Just use IDs if names aren't available